@@ -1,12 +1,25 @@
 import google.generativeai as genai
 import os
+import contextvars
 import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
+from helper_functions import merge_partial_products, personalize_summary
+from json_repair import FAILED, PARTIAL, parse_model_json
+from priority_executor import get_executor
+from result_cache import ResultCache, content_key
 
 load_dotenv()
 API_KEY = os.getenv("GEMINI_API_KEY")
 
-if API_KEY:
+# "gemini" for the real API, "stub" for canned offline responses
+MODEL_BACKEND = os.getenv("TRUTHINBITE_MODEL_BACKEND", "gemini").lower()
+
+if MODEL_BACKEND == "stub":
+    print("Using stub model backend (no network calls)")
+elif API_KEY:
     try:
         genai.configure(api_key=API_KEY)
     except Exception as e:
@@ -16,17 +29,242 @@ else:
 
 # Cache for model instances
 _model_cache = {}
+_model_lock = threading.Lock()
+
+# Extra model calls when a response holds no recoverable JSON at all
+JSON_RETRIES = int(os.getenv("TRUTHINBITE_JSON_RETRIES", "1"))
+
+# Models built and connected by warmup_models before the first request
+MODEL_TIERS = [
+    name.strip()
+    for name in os.getenv("TRUTHINBITE_MODEL_TIERS", "gemini-2.5-flash").split(",")
+    if name.strip()
+]
+
+# Warm up in the background as soon as the process imports this module
+WARMUP_AT_START = os.getenv("TRUTHINBITE_WARMUP", "").lower() in ("1", "true", "yes")
+
+_ready = threading.Event()
+_warmup_lock = threading.Lock()
+_warmup_thread = None
+_warmup_report = {}
+
+# Work fanned out on behalf of one request: images of one upload (e.g. front
+# and back of a packet) extracted in parallel, and summaries computed while
+# the page renders its local sections. These threads mostly wait on the
+# priority executor, which enforces the real model concurrency.
+FANOUT_WORKERS = int(os.getenv("TRUTHINBITE_FANOUT_WORKERS", "32"))
+_fanout_pool = ThreadPoolExecutor(
+    max_workers=FANOUT_WORKERS, thread_name_prefix="ai-fanout"
+)
+
+# Caches for model results, shared by every session in the process
+_extraction_cache = ResultCache("extractions")
+_summary_cache = ResultCache("summary")
+_alternatives_cache = ResultCache("alternatives")
+
+# Truncated extractions, kept only long enough for the page that asked for
+# them; they never enter the shared cache or snapshots, so the next upload
+# of the same label asks the model again
+PARTIAL_TTL_SECONDS = float(os.getenv("TRUTHINBITE_PARTIAL_TTL", "600"))
+_partial_extractions = ResultCache("partial_extractions", max_entries=64)
+
+# Caches saved in / restored from snapshots, by name
+_snapshot_caches = {
+    cache.name: cache
+    for cache in (_extraction_cache, _summary_cache, _alternatives_cache)
+}
+SNAPSHOT_FORMAT = 1
+
+# Verdict of the placeholder summary shown when the model call fails
+FAILED_VERDICT = "Analysis failed"
 
 
 def get_model(model_name="gemini-2.5-flash"):
     """Get cached model instance for better performance"""
-    if model_name not in _model_cache:
-        _model_cache[model_name] = genai.GenerativeModel(model_name)
-    return _model_cache[model_name]
+    with _model_lock:
+        if model_name not in _model_cache:
+            if MODEL_BACKEND == "stub":
+                from stub_model import StubModel
+
+                _model_cache[model_name] = StubModel(model_name)
+            else:
+                _model_cache[model_name] = genai.GenerativeModel(model_name)
+        return _model_cache[model_name]
+
+
+def warmup_models(tiers=None):
+    """Build every configured model and open its connection ahead of traffic
+
+    count_tokens is a cheap authenticated round trip with no generation, so
+    channel setup, TLS and auth are paid here instead of by the first user.
+    Marks the process ready when done, even if a tier failed to connect.
+    """
+    tiers = tiers or MODEL_TIERS
+
+    def warm(model_name):
+        start = time.perf_counter()
+        try:
+            get_model(model_name).count_tokens("warm-up")
+            result = {"ok": True}
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+        result["seconds"] = round(time.perf_counter() - start, 3)
+        return result
+
+    # Tiers connect independently, so warm them side by side
+    with ThreadPoolExecutor(max_workers=max(1, len(tiers))) as pool:
+        report = dict(zip(tiers, pool.map(warm, tiers)))
+
+    _warmup_report.update(report)
+    _ready.set()
+    return report
+
+
+def start_warmup(tiers=None):
+    """Run warmup_models once in a background thread"""
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _ready.clear()
+            _warmup_thread = threading.Thread(
+                target=warmup_models, args=(tiers,), name="model-warmup", daemon=True
+            )
+            _warmup_thread.start()
+    return _warmup_thread
+
+
+def is_ready():
+    """True once warm-up has finished (always True when warm-up is off)"""
+    return _ready.is_set()
+
+
+def warmup_status():
+    return {"ready": is_ready(), "models": dict(_warmup_report)}
+
+
+if WARMUP_AT_START:
+    start_warmup()
+else:
+    _ready.set()
+
+
+def generate_content(model, contents):
+    """Model call routed through the shared priority executor
+
+    Interactive scans are dispatched ahead of batch jobs, which are capped
+    at TRUTHINBITE_BATCH_CONCURRENCY concurrent calls.
+    """
+    return get_executor().run(model.generate_content, contents)
+
+
+def export_cache_snapshot():
+    """Model-result caches as JSON-serialisable data, oldest entries first
+
+    Keys are content hashes, so a snapshot taken on one instance is valid
+    on any other running the same code.
+    """
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "created": time.time(),
+        "caches": {name: cache.items() for name, cache in _snapshot_caches.items()},
+    }
+
+
+def load_cache_snapshot(snapshot):
+    """Fill the caches from export_cache_snapshot data; returns counts per cache"""
+    if not isinstance(snapshot, dict) or snapshot.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError("Unsupported cache snapshot format")
+
+    counts = {}
+    for name, entries in snapshot.get("caches", {}).items():
+        cache = _snapshot_caches.get(name)
+        if cache is None:
+            continue
+        for key, value in entries:
+            cache.put(key, value)
+        counts[name] = len(entries)
+    return counts
+
+
+# Shape checks for parsed responses; anything else is treated as no answer
+_PRODUCT_FIELDS = ("product_name", "ingredients", "nutrition_facts")
+
+
+def _is_product_list(value):
+    return all(
+        isinstance(item, dict) and any(field in item for field in _PRODUCT_FIELDS)
+        for item in value
+    )
+
+
+def _is_summary(value):
+    return "score" in value
 
 
-def get_structured_data_from_gemini(pil_image):
-    """Extract structured data from food label image"""
+def _is_alternatives(value):
+    return all(isinstance(item, dict) and item.get("name") for item in value)
+
+
+def generate_json(model, contents, expect=list, accept=None):
+    """Model call parsed leniently; returns (value, parse status)
+
+    Syntax slips are repaired and truncated output keeps its complete
+    part (see json_repair). The model is only asked again, up to
+    JSON_RETRIES times, when nothing usable could be recovered: an empty
+    value, or one that accept(value) rejects, counts as nothing.
+    """
+    for _ in range(JSON_RETRIES + 1):
+        response = generate_content(model, contents)
+        value, status = parse_model_json(response.text, expect, accept)
+        if value is not None:
+            return value, status
+    return None, FAILED
+
+
+def get_cached_extraction(cache_key):
+    """Product list previously extracted for an image hash, or None
+
+    Falls back to a recent partial extraction so the page that triggered
+    it can still render it.
+    """
+    cached = _extraction_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    partial = _partial_extractions.get(cache_key)
+    if partial is not None and partial[0] > time.monotonic():
+        return partial[1]
+    return None
+
+
+def _store_extraction(cache_key, products, complete):
+    if cache_key is None:
+        return
+    if complete:
+        _extraction_cache.put(cache_key, products)
+    else:
+        _partial_extractions.put(
+            cache_key, (time.monotonic() + PARTIAL_TTL_SECONDS, products)
+        )
+
+
+def get_structured_data_from_gemini(pil_image, cache_key=None):
+    """Extract structured data from food label image
+
+    cache_key (the image content hash) lets every session share one
+    extraction per distinct label.
+    """
+    return _extract_label(pil_image, cache_key)[0]
+
+
+def _extract_label(pil_image, cache_key=None):
+    """(product list or error dict, complete) for one label image"""
+    if cache_key is not None:
+        cached = _extraction_cache.get(cache_key)
+        if cached is not None:
+            return cached, True
+
     try:
         model = get_model("gemini-2.5-flash")
 
@@ -66,27 +304,68 @@ def get_structured_data_from_gemini(pil_image):
         - Include all allergen warnings
         """
 
-        response = model.generate_content([prompt, pil_image])
-        json_text = response.text.strip().replace("``````", "").strip()
-
-        # Clean up JSON
-        start_idx = json_text.find("[")
-        end_idx = json_text.rfind("]") + 1
+        data, status = generate_json(
+            model, [prompt, pil_image], expect=list, accept=_is_product_list
+        )
+        if data is None:
+            return {
+                "error": "AI returned invalid JSON. Please try with a clearer image."
+            }, False
 
-        if start_idx != -1 and end_idx != 0:
-            json_text = json_text[start_idx:end_idx]
+        complete = status != PARTIAL
+        _store_extraction(cache_key, data, complete)
+        return data, complete
 
-        data = json.loads(json_text)
-        return data
-
-    except json.JSONDecodeError:
-        return {"error": "AI returned invalid JSON. Please try with a clearer image."}
     except Exception as e:
-        return {"error": f"Error processing image: {str(e)}"}
-
+        return {"error": f"Error processing image: {str(e)}"}, False
+
+
+def get_structured_data_from_images(images, cache_key=None):
+    """Extract several label images in parallel and merge them into products
+
+    images is a list of (pil_image, image_key) pairs. Each image is
+    extracted (and cached) on its own; the partial records are merged by
+    product name and net weight, and the merged list is cached under
+    cache_key once every image has been extracted in full. Images that
+    fail are skipped; the call fails only when no image could be extracted.
+    """
+    if len(images) == 1:
+        return get_structured_data_from_gemini(*images[0])
+
+    if cache_key is not None:
+        cached = _extraction_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    # Each image keeps the caller's workload class (see priority_executor)
+    futures = [
+        _fanout_pool.submit(contextvars.copy_context().run, _extract_label, *image)
+        for image in images
+    ]
+    results = [future.result() for future in futures]
+    partials = [data for data, _ in results if isinstance(data, list)]
+    if not partials:
+        return results[0][0]
+
+    products = merge_partial_products(partials)
+    # Shared only when every image came back whole; otherwise the next
+    # upload of the same images retries the ones that failed
+    complete = all(ok for _, ok in results)
+    _store_extraction(cache_key, products, complete)
+    return products
+
+
+def get_ai_product_summary(product_data):
+    """Ingredient-based score and WHO check for a product, independent of profile
+
+    Cached per product, so every user scanning the same product shares one
+    model call whatever their health conditions.
+    """
+    cache_key = content_key(product_data)
+    cached = _summary_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
-def get_ai_health_summary(product_data, health_profile=None):
-    """Get ingredient-based health score with separate WHO compliance check"""
     try:
         model = get_model("gemini-2.5-flash")
 
@@ -94,7 +373,6 @@ def get_ai_health_summary(product_data, health_profile=None):
         Analyze this food product as a nutrition expert. Score based on INGREDIENT QUALITY, then separately check WHO compliance.
 
         Product: {json.dumps(product_data, indent=2)}
-        User Health Conditions: {health_profile if health_profile else "None specified"}
 
         INGREDIENT-BASED SCORING (0-100):
         
@@ -153,32 +431,73 @@ def get_ai_health_summary(product_data, health_profile=None):
         }}
         """
 
-        response = model.generate_content(prompt)
-        json_text = response.text.strip().replace("``````", "").strip()
-
-        # Extract JSON
-        start_idx = json_text.find("{")
-        end_idx = json_text.rfind("}") + 1
-
-        if start_idx != -1 and end_idx != 0:
-            json_text = json_text[start_idx:end_idx]
+        summary, status = generate_json(
+            model, prompt, expect=dict, accept=_is_summary
+        )
+        if summary is None:
+            raise ValueError("AI returned invalid JSON")
 
-        return json.loads(json_text)
+        # A truncated summary is shown once but asked for again next time
+        if status != PARTIAL:
+            _summary_cache.put(cache_key, summary)
+        return summary
 
     except Exception as e:
         return {
             "score": 0,
-            "verdict": "Analysis failed",
+            "verdict": FAILED_VERDICT,
             "reasons": [f"Error: {str(e)}"],
             "who_compliance": ["Could not check WHO compliance"],
             "ingredient_quality": ["Could not assess ingredient quality"],
         }
 
 
+def get_ai_health_summary(product_data, health_profile=None, condition_hits=None):
+    """Get ingredient-based health score with separate WHO compliance check
+
+    The model call is profile-independent; profile warnings are added
+    locally from the rule pack, so changing conditions costs no model call.
+    """
+    return personalize_summary(
+        get_ai_product_summary(product_data),
+        product_data,
+        health_profile,
+        condition_hits,
+    )
+
+
+def submit_ai_health_summary(product_data, health_profile=None, condition_hits=None):
+    """Start get_ai_health_summary in the background and return a Future
+
+    A cached summary comes back as an already completed Future, so callers
+    can render placeholders only when a model call is really pending.
+    """
+    cached = _summary_cache.get(content_key(product_data))
+    if cached is not None:
+        future = Future()
+        future.set_result(
+            personalize_summary(cached, product_data, health_profile, condition_hits)
+        )
+        return future
+
+    return _fanout_pool.submit(
+        contextvars.copy_context().run,
+        get_ai_health_summary,
+        product_data,
+        health_profile,
+        condition_hits,
+    )
+
+
 def get_healthy_alternatives(
     product_data, health_profile=None, budget_range="Same Price (±10%)"
 ):
     """Get Indian healthy alternatives at similar cost"""
+    cache_key = content_key(product_data, sorted(health_profile or []), budget_range)
+    cached = _alternatives_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
         model = get_model("gemini-2.5-flash")
 
@@ -211,17 +530,12 @@ def get_healthy_alternatives(
         Provide 3-5 alternatives focusing on cleaner, more natural ingredients.
         """
 
-        response = model.generate_content(prompt)
-        json_text = response.text.strip().replace("``````", "").strip()
-
-        # Extract JSON
-        start_idx = json_text.find("[")
-        end_idx = json_text.rfind("]") + 1
-
-        if start_idx != -1 and end_idx != 0:
-            json_text = json_text[start_idx:end_idx]
-
-        return json.loads(json_text)
+        alternatives, status = generate_json(
+            model, prompt, expect=list, accept=_is_alternatives
+        )
+        if alternatives and status != PARTIAL:
+            _alternatives_cache.put(cache_key, alternatives)
+        return alternatives or []
 
     except Exception as e:
         return []
@@ -0,0 +1,398 @@
+"""Standalone HTTP service exposing the TruthInBite analysis pipeline
+
+Endpoints:
+    GET  /health        liveness check
+    GET  /ready         200 once model warm-up has finished, 503 before
+    GET  /metrics       model executor queue depth / wait times, JSON repair
+                        rate, cache stats
+    GET  /cache/snapshot  model-result caches for warm_cache.py to save;
+                        needs "Authorization: Bearer $TRUTHINBITE_SNAPSHOT_TOKEN"
+                        and is disabled when that variable is unset
+    POST /analyze       raw label image bytes -> extracted product list
+    POST /score         {"product": {...}, "health_profile": [...]} -> scores
+    POST /alternatives  {"product": {...}, "health_profile": [...],
+                         "budget_range": "..."} -> alternatives list
+
+POST requests run as interactive work unless they send "X-Workload: batch",
+in which case their model calls queue behind interactive ones.
+
+Run locally without network access:
+    TRUTHINBITE_MODEL_BACKEND=stub python api_server.py --port 8080
+"""
+
+import argparse
+import hmac
+import json
+import os
+import queue
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from ai_functions import (
+    export_cache_snapshot,
+    is_ready,
+    start_warmup,
+    warmup_status,
+    get_structured_data_from_gemini,
+    get_ai_health_summary,
+    get_healthy_alternatives,
+)
+from helper_functions import (
+    get_rule_pack,
+    maybe_reload_rule_pack,
+    calculate_per_serve_nutrition,
+    check_who_compliance,
+)
+from image_cache import load_label_image
+from json_repair import repair_stats
+from priority_executor import INTERACTIVE, PRIORITY_CLASSES, get_executor, workload
+from result_cache import cache_stats
+from warm_cache import (
+    SNAPSHOT_TOKEN,
+    cache_warmup_status,
+    snapshot_export_status,
+    start_cache_warmup,
+    start_snapshot_export,
+)
+
+# Reject request bodies larger than this (bytes)
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+DEFAULT_BUDGET = "Same Price (±10%)"
+
+# Seconds a connection may sit idle (or trickle its body) before a worker
+# drops it; without this an idle client holds a worker forever
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("TRUTHINBITE_REQUEST_TIMEOUT", "30"))
+
+# Expected JSON types for /score and /alternatives payload fields
+PRODUCT_FIELD_TYPES = {
+    "product_name": (str, type(None)),
+    "net_weight": (int, float, str, type(None)),
+    "ingredients": (list, type(None)),
+    "nutrition_facts": (list, type(None)),
+    "allergens": (list, type(None)),
+}
+
+
+class BoundedHTTPServer(HTTPServer):
+    """HTTP server with a fixed worker pool fed by a bounded queue
+
+    Accepted connections wait in the queue until a worker is free. When the
+    queue is full the connection is answered with 503 straight away, so a
+    traffic spike turns into fast rejections instead of unbounded threads.
+    """
+
+    def __init__(self, server_address, handler_class, workers=8, queue_size=32):
+        super().__init__(server_address, handler_class)
+        self.verbose = False
+        self._pending = queue.Queue(maxsize=queue_size)
+        self._workers = []
+        for i in range(workers):
+            worker = threading.Thread(
+                target=self._worker_loop, name=f"api-worker-{i}", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def process_request(self, request, client_address):
+        try:
+            self._pending.put_nowait((request, client_address))
+        except queue.Full:
+            self._reject_busy(request)
+            self.shutdown_request(request)
+
+    def _worker_loop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                break
+
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def _reject_busy(self, request):
+        body = json.dumps({"error": "Server busy, please retry"}).encode()
+        head = (
+            "HTTP/1.0 503 Service Unavailable\r\n"
+            "Content-Type: application/json\r\n"
+            "Retry-After: 1\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode()
+        try:
+            request.sendall(head + body)
+        except OSError:
+            pass
+
+    def queue_depth(self):
+        return self._pending.qsize()
+
+    def server_close(self):
+        for _ in self._workers:
+            self._pending.put(None)
+        super().server_close()
+
+
+def _payload_error(payload):
+    """Why a /score or /alternatives payload has the wrong shape, or None"""
+    product = payload["product"]
+    for field, types in PRODUCT_FIELD_TYPES.items():
+        if not isinstance(product.get(field), types):
+            return f"'product.{field}' has the wrong type"
+
+    for field in ("ingredients", "nutrition_facts"):
+        if not all(isinstance(item, dict) for item in product.get(field) or []):
+            return f"'product.{field}' must be a list of objects"
+    if not all(isinstance(item, str) for item in product.get("allergens") or []):
+        return "'product.allergens' must be a list of strings"
+    for i, fact in enumerate(product.get("nutrition_facts") or []):
+        if not isinstance(fact.get("Nutrient"), str):
+            return f"'product.nutrition_facts[{i}].Nutrient' must be a string"
+        value = fact.get("Value")
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            return f"'product.nutrition_facts[{i}].Value' must be a string or number"
+
+    profile = payload.get("health_profile")
+    if profile is not None and not (
+        isinstance(profile, list) and all(isinstance(c, str) for c in profile)
+    ):
+        return "'health_profile' must be a list of condition names"
+    if not isinstance(payload.get("budget_range"), (str, type(None))):
+        return "'budget_range' must be a string"
+    return None
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """Routes JSON requests to ai_functions and helper_functions"""
+
+    server_version = "TruthInBite/1.0"
+    timeout = REQUEST_TIMEOUT_SECONDS
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(
+                200,
+                {
+                    "status": "ok",
+                    "queue_depth": self.server.queue_depth(),
+                    "rules_version": get_rule_pack().version,
+                },
+            )
+        elif self.path == "/ready":
+            # Load balancers should only route here once models are connected
+            self._send_json(200 if is_ready() else 503, warmup_status())
+        elif self.path == "/metrics":
+            self._send_json(
+                200,
+                {
+                    "http_queue_depth": self.server.queue_depth(),
+                    "model_executor": get_executor().stats(),
+                    "json_repair": repair_stats(),
+                    "caches": cache_stats(),
+                    "cache_warmup": cache_warmup_status(),
+                    "cache_snapshot": snapshot_export_status(),
+                },
+            )
+        elif self.path == "/cache/snapshot":
+            # Snapshots carry every user's extracted label data
+            if not SNAPSHOT_TOKEN:
+                self._send_json(404, {"error": "Cache snapshots are disabled"})
+            elif not hmac.compare_digest(
+                self.headers.get("Authorization", ""), f"Bearer {SNAPSHOT_TOKEN}"
+            ):
+                self._send_json(401, {"error": "Snapshot token required"})
+            else:
+                self._send_json(200, export_cache_snapshot())
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint: {self.path}"})
+
+    def do_POST(self):
+        routes = {
+            "/analyze": self._handle_analyze,
+            "/score": self._handle_score,
+            "/alternatives": self._handle_alternatives,
+        }
+        handler = routes.get(self.path)
+        if handler is None:
+            self._send_json(404, {"error": f"Unknown endpoint: {self.path}"})
+            return
+
+        priority = self.headers.get("X-Workload", INTERACTIVE).strip().lower()
+        if priority not in PRIORITY_CLASSES:
+            self._send_json(400, {"error": f"Unknown X-Workload: {priority}"})
+            return
+
+        body = self._read_body()
+        if body is None:
+            return
+
+        try:
+            # Model calls are fair-queued per client within their class
+            with workload(priority, self.client_address[0]):
+                handler(body)
+        except Exception as e:
+            self._send_json(500, {"error": f"Internal error: {str(e)}"})
+
+    def _handle_analyze(self, body):
+        try:
+            label = load_label_image(body)
+        except Exception:
+            self._send_json(400, {"error": "Request body is not a valid image"})
+            return
+
+        product_list = get_structured_data_from_gemini(
+            label.upload, cache_key=label.key
+        )
+        if isinstance(product_list, dict) and "error" in product_list:
+            self._send_json(422, product_list)
+        else:
+            self._send_json(200, product_list)
+
+    def _handle_score(self, body):
+        payload = self._parse_product_payload(body)
+        if payload is None:
+            return
+
+        maybe_reload_rule_pack()
+        product = payload["product"]
+        health_profile = payload.get("health_profile") or []
+        nutrition_facts = product.get("nutrition_facts") or []
+
+        self._send_json(
+            200,
+            {
+                # Profile warnings are in summary["profile_warnings"]
+                "summary": get_ai_health_summary(product, health_profile),
+                "per_serve_nutrition": calculate_per_serve_nutrition(
+                    nutrition_facts, product.get("net_weight")
+                ),
+                "who_checks": check_who_compliance(nutrition_facts),
+            },
+        )
+
+    def _handle_alternatives(self, body):
+        payload = self._parse_product_payload(body)
+        if payload is None:
+            return
+
+        alternatives = get_healthy_alternatives(
+            payload["product"],
+            payload.get("health_profile") or [],
+            payload.get("budget_range") or DEFAULT_BUDGET,
+        )
+        self._send_json(200, alternatives)
+
+    def _parse_product_payload(self, body):
+        try:
+            payload = json.loads(body)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self._send_json(400, {"error": "Request body is not valid JSON"})
+            return None
+
+        if not isinstance(payload, dict) or not isinstance(
+            payload.get("product"), dict
+        ):
+            self._send_json(400, {"error": "Expected a JSON object with 'product'"})
+            return None
+
+        error = _payload_error(payload)
+        if error:
+            self._send_json(400, {"error": error})
+            return None
+
+        # Numeric values are scored like their string form, e.g. 600 -> "600"
+        for fact in payload["product"].get("nutrition_facts") or []:
+            fact["Value"] = str(fact["Value"])
+        return payload
+
+    def _read_body(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+
+        if length <= 0:
+            self._send_json(411, {"error": "Content-Length required"})
+            return None
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {"error": "Request body too large"})
+            return None
+
+        try:
+            return self.rfile.read(length)
+        except socket.timeout:
+            self.close_connection = True
+            return None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TruthInBite analysis service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=32,
+        help="Connections allowed to wait for a worker before 503s are returned",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    parser.add_argument(
+        "--warmup",
+        action="store_true",
+        help="Build and connect models before reporting ready "
+        "(also enabled by TRUTHINBITE_WARMUP=1)",
+    )
+    parser.add_argument(
+        "--warm-cache",
+        metavar="PATH",
+        help="Label directory or snapshot file to warm the caches from "
+        "(default: TRUTHINBITE_CACHE_WARM_PATH)",
+    )
+    args = parser.parse_args()
+
+    if args.warmup:
+        start_warmup()
+    if args.warm_cache:
+        start_cache_warmup(args.warm_cache)
+    else:
+        start_cache_warmup()
+    start_snapshot_export()
+
+    server = BoundedHTTPServer(
+        (args.host, args.port),
+        AnalysisRequestHandler,
+        workers=args.workers,
+        queue_size=args.queue_size,
+    )
+    server.verbose = args.verbose
+    print(f"TruthInBite API listening on http://{args.host}:{args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,37 @@
 import streamlit as st
-from PIL import Image
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import os
 from dotenv import load_dotenv
 import pandas as pd
 from ai_functions import (
-    get_structured_data_from_gemini,
-    get_ai_health_summary,
+    FAILED_VERDICT,
+    MODEL_BACKEND,
+    get_cached_extraction,
+    get_structured_data_from_images,
     get_healthy_alternatives,
+    submit_ai_health_summary,
 )
 from helper_functions import (
+    classify_ingredient,
+    get_condition_names,
+    maybe_reload_rule_pack,
+    get_condition_hits,
     run_health_analysis,
     calculate_per_serve_nutrition,
     get_health_score_color,
+    ingredient_index_stats,
+)
+from image_cache import get_cached_label, load_label_image
+from json_repair import repair_stats
+from priority_executor import INTERACTIVE, get_executor, workload
+from result_cache import content_key
+from scan_history import get_scan_history
+from session_store import memory_report, track_session
+from warm_cache import (
+    export_snapshot,
+    snapshot_export_status,
+    start_cache_warmup,
+    start_snapshot_export,
 )
 
 # Load environment variables
@@ -157,11 +177,34 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+# Pre-populate shared caches once per process (TRUTHINBITE_CACHE_WARM_PATH)
+# and save them periodically and at exit (TRUTHINBITE_CACHE_SNAPSHOT_PATH)
+start_cache_warmup()
+start_snapshot_export()
+
 # Check API key
-if not API_KEY:
+if not API_KEY and MODEL_BACKEND != "stub":
     st.error("API Key not found! Please create a .env file with GEMINI_API_KEY.")
     st.stop()
 
+PRODUCT_SECTIONS = [
+    "🧪 Ingredients",
+    "📊 Nutrition",
+    "⚠️ Allergens",
+    "🩺 Personal Health",
+    "🔄 Healthy Alternatives",
+]
+
+BUDGET_OPTIONS = [
+    "Same Price (±10%)",
+    "Budget Friendly (25% less)",
+    "Premium (+25% more)",
+    "Any Price",
+]
+
+# Pick up edited health rules without restarting the server
+maybe_reload_rule_pack()
+
 # Header
 st.title("TruthInBite - AI Health Analyzer")
 st.caption("Ingredient-Based Health Scoring with WHO Compliance Check")
@@ -172,110 +215,372 @@ with st.sidebar:
 
     health_profile = st.multiselect(
         "Select your health conditions:",
-        [
-            "Diabetes Type 1",
-            "Diabetes Type 2",
-            "Pre-Diabetes",
-            "High Blood Pressure",
-            "Heart Disease",
-            "High Cholesterol",
-            "Kidney Disease",
-            "Liver Disease",
-            "Thyroid Issues",
-            "PCOD/PCOS",
-            "Gastric Issues",
-            "IBS",
-            "Nut Allergy",
-            "Gluten Sensitivity",
-            "Lactose Intolerance",
-            "Soy Allergy",
-            "Egg Allergy",
-            "Shellfish Allergy",
-            "Weight Management",
-            "Muscle Building",
-            "Pregnancy",
-            "Breastfeeding",
-            "Child (2-12 years)",
-            "Elderly (60+)",
-            "Vegetarian",
-            "Vegan",
-            "Jain Food",
-        ],
+        get_condition_names(),
         help="Select all conditions that apply to you for personalized analysis",
     )
 
     st.markdown("---")
+    st.info(
+        "📋 **Analysis Method:**\n- Score based on ingredient quality\n- WHO compliance separately checked\n- Personalized health warnings\n- Indian alternative suggestions"
+    )
+
+
+def session_workload():
+    """Model calls made for this browser session
+
+    Each session is its own fair-queue key, so one user's uploads cannot
+    hold up other users' requests.
+    """
+    ctx = get_script_run_ctx()
+    return workload(INTERACTIVE, ctx.session_id if ctx is not None else None)
+
+
+def render_health_score(summary_future):
+    """Health score, ingredient reasons and WHO compliance from the AI summary"""
+    summary = None
+    try:
+        # Shared per-product model result plus locally computed profile layer
+        summary = summary_future.result()
+
+        if summary:
+            score = summary.get("score", 0)
+            verdict = summary.get("verdict", "Analysis unavailable")
+            reasons = summary.get("reasons", [])
+            who_compliance = summary.get("who_compliance", [])
+
+            # Color-coded score
+            color_class, emoji = get_health_score_color(score)
+
+            st.markdown(
+                f"""
+            <div class="health-score {color_class}">
+                <h2>{emoji} {score}/100 Health Score</h2>
+                <p><strong>{verdict}</strong></p>
+            </div>
+            """,
+                unsafe_allow_html=True,
+            )
+
+            # Key points with better visibility
+            if reasons:
+                st.markdown("**📋 Ingredient Analysis:**")
+                for reason in reasons:
+                    st.markdown(f"• {reason}")
+
+            profile_warnings = summary.get("profile_warnings", [])
+            if profile_warnings:
+                st.markdown(
+                    f"**🏥 {len(profile_warnings)} concern(s) for your health "
+                    "profile** - see Personal Health"
+                )
+
+            # WHO Guidelines Compliance (separate from score)
+            if who_compliance:
+                st.markdown(
+                    f"""
+                <div class="who-guidelines">
+                    <strong>🌍 WHO Guidelines Compliance Check:</strong>
+                </div>
+                """,
+                    unsafe_allow_html=True,
+                )
+
+                for compliance in who_compliance:
+                    if (
+                        "exceeds" in compliance.lower()
+                        or "high" in compliance.lower()
+                        or "above" in compliance.lower()
+                    ):
+                        st.warning(f"⚠️ {compliance}")
+                    else:
+                        st.success(f"✅ {compliance}")
+
+    except Exception as e:
+        st.error(f"Health analysis failed: {str(e)}")
+
+    return summary
+
+
+def record_in_history(product, summary, health_profile, condition_hits, scan_key):
+    """Store an analyzed product once per session when history is enabled
+
+    Failed summaries are not stored, so a later rerun that gets a real score
+    can still record the scan.
+    """
+    history = get_scan_history()
+    if history is None or scan_key in st.session_state.recorded_scans:
+        return
+    if not summary or summary.get("verdict") == FAILED_VERDICT:
+        return
+
+    try:
+        history.record_scan(
+            product,
+            summary=summary,
+            warnings=run_health_analysis(product, health_profile, condition_hits),
+            content_hash=scan_key[0],
+        )
+        st.session_state.recorded_scans.add(scan_key)
+    except Exception as e:
+        print(f"Could not record scan history: {e}")
+
+
+def render_ingredients(product):
+    st.markdown("### 🧪 Ingredient Analysis")
+
+    if product.get("ingredients"):
+        ingredients_df = pd.DataFrame(product["ingredients"])
+        st.dataframe(ingredients_df, use_container_width=True, hide_index=True)
+
+        # Enhanced quality assessment with background highlight
+        st.markdown(
+            """
+        <div class="ingredient-quality-section">
+            <strong>📋 Quality Assessment:</strong>
+        </div>
+        """,
+            unsafe_allow_html=True,
+        )
+
+        # One cached classification per distinct ingredient across all labels
+        classified = [
+            classify_ingredient(ing.get("name", ""))
+            for ing in product.get("ingredients", [])
+        ]
+        concerning_found = [info.name for info in classified if info.concerning]
+        natural_found = [info.name for info in classified if info.natural]
+        additive_categories = sorted(
+            {info.additive_category for info in classified if info.additive_category}
+        )
+
+        if concerning_found:
+            st.error(
+                f"⚠️ Concerning ingredients detected: {', '.join(concerning_found[:3])}"
+            )
+        if natural_found:
+            st.success(f"Natural ingredients found: {', '.join(natural_found[:3])}")
+        if additive_categories:
+            st.info(f"🧂 Additive types: {', '.join(additive_categories)}")
 
-    # Budget range for alternatives
+
+def render_nutrition(product):
+    if product.get("nutrition_facts"):
+        nutrition_df = pd.DataFrame(product["nutrition_facts"])
+        net_weight = product.get("net_weight")
+
+        if net_weight:
+            per_serve_values = calculate_per_serve_nutrition(
+                product["nutrition_facts"], net_weight
+            )
+            if per_serve_values:
+                nutrition_df[f"Per Serving ({net_weight}g)"] = per_serve_values
+
+        nutrition_df.rename(columns={"Value": "Per 100g"}, inplace=True)
+        st.dataframe(nutrition_df, use_container_width=True, hide_index=True)
+    else:
+        st.warning("No nutrition information found")
+
+
+def render_allergens(product):
+    if product.get("allergens"):
+        allergen_df = pd.DataFrame(product["allergens"], columns=["Allergen"])
+        st.dataframe(allergen_df, use_container_width=True, hide_index=True)
+    else:
+        st.success("✅ No allergen information found")
+
+
+def render_personal_health(product, health_profile, condition_hits):
+    if health_profile:
+        # Precomputed hit mask: a profile change is just a bitwise AND
+        warnings = run_health_analysis(product, health_profile, condition_hits)
+        if warnings:
+            for warning in warnings:
+                st.error(f"🚨 {warning}")
+        else:
+            st.success("✅ No specific concerns for your health profile")
+    else:
+        st.info(
+            "👆 Select your health conditions in the sidebar for personalized analysis"
+        )
+
+
+def render_alternatives(product, index, health_profile):
+    # Indian Healthy Alternatives
+    st.markdown("### 🔄 Healthy Alternatives")
+
+    # Lives inside the fragment so budget changes only rerun this section
     budget_range = st.selectbox(
         "💰 Budget Range for Alternatives:",
-        [
-            "Same Price (±10%)",
-            "Budget Friendly (25% less)",
-            "Premium (+25% more)",
-            "Any Price",
-        ],
+        BUDGET_OPTIONS,
+        key=f"budget_{index}",
     )
 
-    st.markdown("---")
-    st.info(
-        "📋 **Analysis Method:**\n- Score based on ingredient quality\n- WHO compliance separately checked\n- Personalized health warnings\n- Indian alternative suggestions"
+    try:
+        with st.spinner("🌿 Finding healthier alternatives..."), session_workload():
+            alternatives = get_healthy_alternatives(
+                product, health_profile, budget_range
+            )
+
+        if alternatives:
+            st.markdown(
+                f"""
+            <div class="alternative-box">
+                <strong>🌿 Healthier Indian Alternatives at Similar Cost:</strong>
+            </div>
+            """,
+                unsafe_allow_html=True,
+            )
+
+            for idx, alt in enumerate(alternatives):
+                name = alt.get("name", "Unknown")
+                why_better = alt.get("why_better", "")
+                price_range = alt.get("price_range", "")
+                availability = alt.get("availability", "")
+
+                st.markdown(
+                    f"""
+                <div class="alternative-item">
+                    <h4>🌿 {name}</h4>
+                    <p><strong>💚 Why it's better:</strong> {why_better}</p>
+                    <p><strong>💰 Price:</strong> {price_range}</p>
+                    <p><strong>🛒 Where to buy:</strong> {availability}</p>
+                </div>
+                """,
+                    unsafe_allow_html=True,
+                )
+
+        else:
+            st.info("No specific alternatives found for this product.")
+
+    except Exception as e:
+        st.error(f"Could not fetch alternatives: {str(e)}")
+
+
+@st.fragment
+def render_product_sections(product, index, health_profile, condition_hits):
+    """Detail sections for one product, rerun independently of the page
+
+    Only the selected section is rendered, so alternatives are requested from
+    the model only once someone actually opens that section.
+    """
+    section = st.radio(
+        "Section",
+        PRODUCT_SECTIONS,
+        horizontal=True,
+        key=f"section_{index}",
+        label_visibility="collapsed",
     )
 
+    if section == "🧪 Ingredients":
+        render_ingredients(product)
+    elif section == "📊 Nutrition":
+        render_nutrition(product)
+    elif section == "⚠️ Allergens":
+        render_allergens(product)
+    elif section == "🩺 Personal Health":
+        render_personal_health(product, health_profile, condition_hits)
+    else:
+        render_alternatives(product, index, health_profile)
+
+
+# Initialize session state (only small references; results live in shared caches)
+if "label_key" not in st.session_state:
+    st.session_state.label_key = None
+if "uploader_id" not in st.session_state:
+    st.session_state.uploader_id = 0
+if "recorded_scans" not in st.session_state:
+    st.session_state.recorded_scans = set()
+if "image_keys" not in st.session_state:
+    st.session_state.image_keys = []
+
 # File upload
 st.subheader("📸 Upload Food Label")
-uploaded_file = st.file_uploader(
-    "Choose a food label image...",
+uploaded_files = st.file_uploader(
+    "Choose food label images...",
     type=["jpg", "jpeg", "png", "webp"],
-    help="Upload a clear image of the food product label",
+    accept_multiple_files=True,
+    help="Upload one or more clear images of the label, e.g. the front and back of the packet",
+    key=f"label_upload_{st.session_state.uploader_id}",
 )
 
-# Initialize session state
-if "processed_data" not in st.session_state:
-    st.session_state.processed_data = None
-if "current_image" not in st.session_state:
-    st.session_state.current_image = None
-
 # Main processing
-if uploaded_file is not None:
-    image = Image.open(uploaded_file)
+if uploaded_files:
+    # Decoded once per distinct image, then served from cache on reruns
+    labels = sorted(
+        (load_label_image(f.getvalue()) for f in uploaded_files),
+        key=lambda label: label.key,
+    )
+    if len(labels) == 1:
+        upload_key = labels[0].key
+    else:
+        upload_key = content_key("merged_labels", [label.key for label in labels])
+
+    # Progress bar
+    progress = st.progress(0)
+    status = st.empty()
+
+    # Extract data
+    status.text(
+        "🔍 Analyzing food label..."
+        if len(labels) == 1
+        else f"🔍 Analyzing {len(labels)} label images in parallel..."
+    )
+    progress.progress(25)
 
-    # new image
-    image_changed = st.session_state.current_image != uploaded_file.name
+    try:
+        with session_workload():
+            product_list = get_structured_data_from_images(
+                [(label.upload, label.key) for label in labels], cache_key=upload_key
+            )
+        progress.progress(50)
 
-    if image_changed or st.session_state.processed_data is None:
-        st.session_state.current_image = uploaded_file.name
+        if isinstance(product_list, dict) and "error" in product_list:
+            st.error(f"❌ {product_list['error']}")
+            st.stop()
 
-        # Progress bar
-        progress = st.progress(0)
-        status = st.empty()
+        # Condition hits are computed once per product list and rule version
+        get_condition_hits(product_list)
 
-        # Extract data
-        status.text("🔍 Analyzing food label...")
-        progress.progress(25)
+        progress.progress(100)
+        status.text("✅ Analysis complete!")
 
-        try:
-            product_list = get_structured_data_from_gemini(image)
-            progress.progress(50)
+    except Exception as e:
+        st.error(f"❌ Error: {str(e)}")
+        st.stop()
 
-            if isinstance(product_list, dict) and "error" in product_list:
-                st.error(f"❌ {product_list['error']}")
-                st.stop()
+    # Keep only content hashes and release the uploaded bytes from the session
+    st.session_state.label_key = upload_key
+    st.session_state.image_keys = [label.key for label in labels]
+    st.session_state.uploader_id += 1
+    st.rerun()
 
-            st.session_state.processed_data = product_list
-            progress.progress(100)
-            status.text("✅ Analysis complete!")
+label_key = st.session_state.label_key
+product_list = get_cached_extraction(label_key) if label_key else None
 
-        except Exception as e:
-            st.error(f"❌ Error: {str(e)}")
-            st.stop()
+if label_key and product_list is None:
+    # Shared cache evicted this label under memory pressure
+    st.session_state.label_key = None
+    st.warning("⏳ This analysis expired from memory. Please upload the label again.")
 
+if product_list is not None:
     # Display results
-    product_list = st.session_state.processed_data
+    labels = [get_cached_label(key) for key in st.session_state.image_keys]
 
     if product_list and isinstance(product_list, list):
+        hits = get_condition_hits(product_list)
+
+        # Start the AI summaries first; everything below them is computed
+        # locally and renders while the model works. The futures carry the
+        # session's workload into the fan-out pool.
+        with session_workload():
+            summary_futures = [
+                submit_ai_health_summary(product, health_profile, hits[i])
+                for i, product in enumerate(product_list)
+            ]
+        score_slots = []
+
         for i, product in enumerate(product_list):
-            product_name = product.get("product_name", f"Product #{i+1}")
+            product_name = product.get("product_name") or f"Product #{i+1}"
 
             st.markdown("---")
             st.subheader(f"🏷️ {product_name}")
@@ -284,220 +589,36 @@ if uploaded_file is not None:
             col1, col2 = st.columns([1, 2])
 
             with col1:
-                st.image(image, caption="Product Label", use_container_width=True)
-
-            with col2:
-                # Health Score Analysis
-                try:
-                    summary = get_ai_health_summary(product, health_profile)
-
-                    if summary:
-                        score = summary.get("score", 0)
-                        verdict = summary.get("verdict", "Analysis unavailable")
-                        reasons = summary.get("reasons", [])
-                        who_compliance = summary.get("who_compliance", [])
-
-                        # Color-coded score
-                        color_class, emoji = get_health_score_color(score)
-
-                        st.markdown(
-                            f"""
-                        <div class="health-score {color_class}">
-                            <h2>{emoji} {score}/100 Health Score</h2>
-                            <p><strong>{verdict}</strong></p>
-                        </div>
-                        """,
-                            unsafe_allow_html=True,
-                        )
-
-                        # Key points with better visibility
-                        if reasons:
-                            st.markdown("**📋 Ingredient Analysis:**")
-                            for reason in reasons:
-                                st.markdown(f"• {reason}")
-
-                        # WHO Guidelines Compliance (separate from score)
-                        if who_compliance:
-                            st.markdown(
-                                f"""
-                            <div class="who-guidelines">
-                                <strong>🌍 WHO Guidelines Compliance Check:</strong>
-                            </div>
-                            """,
-                                unsafe_allow_html=True,
-                            )
-
-                            for compliance in who_compliance:
-                                if (
-                                    "exceeds" in compliance.lower()
-                                    or "high" in compliance.lower()
-                                    or "above" in compliance.lower()
-                                ):
-                                    st.warning(f"⚠️ {compliance}")
-                                else:
-                                    st.success(f"✅ {compliance}")
-
-                except Exception as e:
-                    st.error(f"Health analysis failed: {str(e)}")
-
-            # Detailed tabs
-            tab1, tab2, tab3, tab4, tab5 = st.tabs(
-                [
-                    "🧪 Ingredients",
-                    "📊 Nutrition",
-                    "⚠️ Allergens",
-                    "🩺 Personal Health",
-                    "🔄 Healthy Alternatives",
-                ]
-            )
-
-            with tab1:
-                st.markdown("### 🧪 Ingredient Analysis")
-
-                if product.get("ingredients"):
-                    ingredients_df = pd.DataFrame(product["ingredients"])
-                    st.dataframe(
-                        ingredients_df, use_container_width=True, hide_index=True
-                    )
-
-                    # Enhanced quality assessment with background highlight
-                    st.markdown(
-                        """
-                    <div class="ingredient-quality-section">
-                        <strong>📋 Quality Assessment:</strong>
-                    </div>
-                    """,
-                        unsafe_allow_html=True,
-                    )
-
-                    ingredient_names = [
-                        ing.get("name", "").lower()
-                        for ing in product.get("ingredients", [])
-                    ]
-
-                    # Check for concerning ingredients
-                    concerning = [
-                        "artificial",
-                        "synthetic",
-                        "modified",
-                        "hydrogenated",
-                        "trans",
-                        "msg",
-                        "aspartame",
-                        "acesulfame",
-                    ]
-                    natural = ["whole", "organic", "natural", "pure", "fresh"]
-
-                    concerning_found = [
-                        ing
-                        for ing in ingredient_names
-                        if any(c in ing for c in concerning)
-                    ]
-                    natural_found = [
-                        ing
-                        for ing in ingredient_names
-                        if any(n in ing for n in natural)
-                    ]
-
-                    if concerning_found:
-                        st.error(
-                            f"⚠️ Concerning ingredients detected: {', '.join(concerning_found[:3])}"
-                        )
-                    if natural_found:
-                        st.success(
-                            f"Natural ingredients found: {', '.join(natural_found[:3])}"
-                        )
-
-            with tab2:
-                if product.get("nutrition_facts"):
-                    nutrition_df = pd.DataFrame(product["nutrition_facts"])
-                    net_weight = product.get("net_weight")
-
-                    if net_weight:
-                        per_serve_values = calculate_per_serve_nutrition(
-                            product["nutrition_facts"], net_weight
-                        )
-                        if per_serve_values:
-                            nutrition_df[f"Per Serving ({net_weight}g)"] = (
-                                per_serve_values
-                            )
-
-                    nutrition_df.rename(columns={"Value": "Per 100g"}, inplace=True)
-                    st.dataframe(
-                        nutrition_df, use_container_width=True, hide_index=True
-                    )
-                else:
-                    st.warning("No nutrition information found")
-
-            with tab3:
-                if product.get("allergens"):
-                    allergen_df = pd.DataFrame(
-                        product["allergens"], columns=["Allergen"]
-                    )
-                    st.dataframe(allergen_df, use_container_width=True, hide_index=True)
-                else:
-                    st.success("✅ No allergen information found")
-
-            with tab4:
-                if health_profile:
-                    warnings = run_health_analysis(product, health_profile)
-                    if warnings:
-                        for warning in warnings:
-                            st.error(f"🚨 {warning}")
-                    else:
-                        st.success("✅ No specific concerns for your health profile")
-                else:
-                    st.info(
-                        "👆 Select your health conditions in the sidebar for personalized analysis"
-                    )
-
-            with tab5:
-                # Indian Healthy Alternatives
-                st.markdown("### 🔄 Healthy Alternatives")
-
-                try:
-                    alternatives = get_healthy_alternatives(
-                        product, health_profile, budget_range
-                    )
-
-                    if alternatives:
-                        st.markdown(
-                            f"""
-                        <div class="alternative-box">
-                            <strong>🌿 Healthier Indian Alternatives at Similar Cost:</strong>
-                        </div>
-                        """,
-                            unsafe_allow_html=True,
+                for label in labels:
+                    if label is not None:
+                        st.image(
+                            label.display,
+                            caption="Product Label",
+                            use_container_width=True,
                         )
 
-                        for idx, alt in enumerate(alternatives):
-                            name = alt.get("name", "Unknown")
-                            why_better = alt.get("why_better", "")
-                            price_range = alt.get("price_range", "")
-                            availability = alt.get("availability", "")
-
-                            st.markdown(
-                                f"""
-                            <div class="alternative-item">
-                                <h4>🌿 {name}</h4>
-                                <p><strong>💚 Why it's better:</strong> {why_better}</p>
-                                <p><strong>💰 Price:</strong> {price_range}</p>
-                                <p><strong>🛒 Where to buy:</strong> {availability}</p>
-                            </div>
-                            """,
-                                unsafe_allow_html=True,
-                            )
-
-                    else:
-                        st.info("No specific alternatives found for this product.")
+            with col2:
+                slot = st.empty()
+                if not summary_futures[i].done():
+                    slot.info("⏳ Calculating AI health score...")
+                score_slots.append(slot)
 
-                except Exception as e:
-                    st.error(f"Could not fetch alternatives: {str(e)}")
+            # Detailed sections
+            render_product_sections(product, i, health_profile, hits[i])
 
             # Debug info (optional)
             with st.expander("🔧 Raw Data (Debug)"):
                 st.json(product)
 
+        # Fill in the AI panels as their results arrive
+        for i, product in enumerate(product_list):
+            with score_slots[i].container():
+                summary = render_health_score(summary_futures[i])
+
+            record_in_history(
+                product, summary, health_profile, hits[i], (label_key, i)
+            )
+
     else:
         st.error(
             "❌ Could not analyze the uploaded image. Please try with a cleaner food label."
@@ -527,3 +648,26 @@ else:
     3. Get ingredient-based health score and WHO compliance check!
     """
     )
+
+# Per-session memory accounting (see session_store.py)
+ctx = get_script_run_ctx()
+if ctx is not None:
+    track_session(ctx.session_id, st.session_state)
+
+if os.getenv("TRUTHINBITE_DIAGNOSTICS"):
+    with st.sidebar.expander("🧠 Memory diagnostics"):
+        st.json(memory_report())
+        st.json(
+            {
+                "ingredient_index": ingredient_index_stats(),
+                "model_executor": get_executor().stats(),
+                "json_repair": repair_stats(),
+                "cache_snapshot": snapshot_export_status(),
+            }
+        )
+        if snapshot_export_status() and st.button("💾 Save cache snapshot now"):
+            try:
+                export_snapshot(snapshot_export_status()["path"])
+                st.success("Cache snapshot saved")
+            except Exception as e:
+                st.error(f"Could not save cache snapshot: {e}")
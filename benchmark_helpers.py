@@ -0,0 +1,347 @@
+"""Microbenchmarks for the pure functions in helper_functions.py
+
+Generates synthetic catalog products (long ingredient lists, 30+ nutrition
+rows, every health condition selected) and measures ops/sec and peak
+allocation per call at several catalog sizes. Speed is the median of
+several timed samples. Results are compared with a stored baseline and the
+run exits non-zero when any function slows down or allocates more than the
+allowed tolerance (wider for sub-microsecond calls).
+
+    python benchmark_helpers.py                   # compare with baseline
+    python benchmark_helpers.py --save-baseline   # record a new baseline
+    python benchmark_helpers.py --scales 1,1000   # quicker run
+
+Baselines are machine-specific; record them on the machine that runs the
+comparison.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from helper_functions import (
+    ConditionHits,
+    calculate_per_serve_nutrition,
+    check_who_compliance,
+    get_condition_names,
+    get_health_score_color,
+    run_health_analysis,
+)
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json"
+)
+
+DEFAULT_SCALES = [1, 1000, 100000]
+
+# Distinct synthetic products; larger catalogs reuse their contents
+PRODUCT_POOL_SIZE = 1000
+
+# Calls made between clock reads when timing small catalogs
+TIMING_BATCH = 1000
+
+# Cases faster than this (about a microsecond per call) are dominated by
+# interpreter and CPU-frequency noise, so they get FAST_TOLERANCE instead
+FAST_OPS_PER_SEC = 1_000_000
+FAST_TOLERANCE = 0.6
+
+INGREDIENT_VOCABULARY = [
+    "refined wheat flour (maida)",
+    "sugar",
+    "palm oil",
+    "hydrogenated vegetable fat",
+    "iodised salt",
+    "milk solids",
+    "cocoa butter",
+    "emulsifier (soy lecithin)",
+    "raising agent (sodium bicarbonate)",
+    "artificial flavour (vanilla)",
+    "invert sugar syrup",
+    "whole wheat flour",
+    "rolled oats",
+    "almonds",
+    "cashew",
+    "dried onion",
+    "garlic powder",
+    "red chili powder",
+    "citric acid",
+    "preservative (sodium benzoate)",
+    "colour (INS 102)",
+    "maltodextrin",
+    "whey protein concentrate",
+    "rice flour",
+    "corn starch",
+    "jaggery",
+    "ghee",
+    "coconut oil",
+    "spices and condiments",
+    "natural identical flavouring substances",
+    "potato flakes",
+    "tomato powder",
+    "egg powder",
+    "gelatin",
+    "acidity regulator (INS 330)",
+    "stabiliser (INS 412)",
+    "honey",
+    "caffeine",
+    "dried fruit pieces",
+    "millet flour",
+]
+
+NUTRIENT_NAMES = [
+    "Energy",
+    "Total Fat",
+    "Saturated Fat",
+    "Trans Fat",
+    "Monounsaturated Fat",
+    "Polyunsaturated Fat",
+    "Cholesterol",
+    "Sodium",
+    "Potassium",
+    "Total Carbohydrates",
+    "Dietary Fiber",
+    "Total Sugars",
+    "Added Sugars",
+    "Protein",
+    "Calcium",
+    "Iron",
+    "Magnesium",
+    "Phosphorus",
+    "Zinc",
+    "Vitamin A",
+    "Vitamin C",
+    "Vitamin D",
+    "Vitamin E",
+    "Vitamin B1",
+    "Vitamin B2",
+    "Vitamin B3",
+    "Vitamin B6",
+    "Vitamin B12",
+    "Folic Acid",
+    "Iodine",
+    "Selenium",
+    "Caffeine",
+]
+
+NUTRIENT_UNITS = {"Energy": "kcal", "Sodium": "mg", "Cholesterol": "mg"}
+
+
+def make_product(rng):
+    """One synthetic product with a long label"""
+    return {
+        "product_name": f"Synthetic Product {rng.randrange(10**6)}",
+        "net_weight": float(rng.choice([25, 40, 70, 100, 150, 200, 500])),
+        "ingredients": [
+            {"name": name, "details": f"{rng.randint(1, 60)}%"}
+            for name in rng.sample(INGREDIENT_VOCABULARY, rng.randint(25, 40))
+        ],
+        "nutrition_facts": [
+            {
+                "Nutrient": name,
+                "Value": f"{rng.uniform(0, 600):.1f}{NUTRIENT_UNITS.get(name, 'g')}",
+            }
+            for name in NUTRIENT_NAMES
+        ],
+        "allergens": rng.sample(
+            ["Contains milk", "Contains wheat", "May contain nuts", "Contains soy"],
+            2,
+        ),
+    }
+
+
+def make_catalog(size, seed=42):
+    """Catalog of `size` products built from a pool of distinct ones"""
+    rng = random.Random(seed)
+    pool = [make_product(rng) for _ in range(min(size, PRODUCT_POOL_SIZE))]
+
+    # Hit masks are computed once per product, as the app does at extraction
+    for product in pool:
+        product["condition_hits"] = ConditionHits.of(product)
+    return [dict(pool[i % len(pool)]) for i in range(size)]
+
+
+def benchmark_cases(profile):
+    """(name, per-product call) pairs for every benchmarked function"""
+    return [
+        ("run_health_analysis", lambda p: run_health_analysis(p, profile)),
+        (
+            "run_health_analysis_precomputed",
+            lambda p: run_health_analysis(p, profile, p["condition_hits"]),
+        ),
+        (
+            "calculate_per_serve_nutrition",
+            lambda p: calculate_per_serve_nutrition(
+                p["nutrition_facts"], p["net_weight"]
+            ),
+        ),
+        (
+            "check_who_compliance",
+            lambda p: check_who_compliance(p["nutrition_facts"]),
+        ),
+        (
+            "get_health_score_color",
+            lambda p: get_health_score_color(int(p["net_weight"]) % 101),
+        ),
+    ]
+
+
+def measure_ops_per_sec(call, catalog, min_time=0.2, repeat=7, max_time=5.0):
+    """Median calls per second over `repeat` samples of at least min_time
+
+    Small catalogs are repeated so the clock is read once per
+    TIMING_BATCH calls, not once per call. Catalogs whose passes are slow
+    stop after 3 samples once max_time is spent (one for a single pass
+    longer than max_time).
+    """
+    batch = catalog * max(1, -(-TIMING_BATCH // len(catalog)))
+    samples = []
+    spent = 0.0
+    while len(samples) < repeat:
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            for product in batch:
+                call(product)
+            calls += len(batch)
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        samples.append(calls / elapsed)
+        spent += elapsed
+        if elapsed > max_time or (len(samples) >= 3 and spent > max_time):
+            break
+    return statistics.median(samples)
+
+
+def measure_alloc_per_call(call, catalog, samples=200):
+    """Average peak traced allocation (bytes) of a single call"""
+    sample = catalog[:samples]
+    total = 0
+    tracemalloc.start()
+    try:
+        for product in sample:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            call(product)
+            total += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return total / len(sample)
+
+
+def run_benchmarks(scales, min_time=0.2, repeat=7):
+    profile = get_condition_names()
+    results = {}
+    for scale in scales:
+        catalog = make_catalog(scale)
+        for name, call in benchmark_cases(profile):
+            ops_per_sec = measure_ops_per_sec(call, catalog, min_time, repeat)
+            alloc_per_call = measure_alloc_per_call(call, catalog)
+            results[f"{name}@{scale}"] = {
+                "ops_per_sec": round(ops_per_sec, 1),
+                "alloc_bytes_per_call": round(alloc_per_call, 1),
+            }
+        del catalog
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """List of regression messages (empty when everything is within tolerance)"""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+
+        allowed = tolerance
+        if previous["ops_per_sec"] >= FAST_OPS_PER_SEC:
+            allowed = max(tolerance, FAST_TOLERANCE)
+        min_ops = previous["ops_per_sec"] * (1 - allowed)
+        if current["ops_per_sec"] < min_ops:
+            regressions.append(
+                f"{key}: {current['ops_per_sec']:.0f} ops/s is below baseline "
+                f"{previous['ops_per_sec']:.0f} ops/s (-{allowed:.0%} allowed)"
+            )
+
+        max_alloc = previous["alloc_bytes_per_call"] * (1 + tolerance) + 64
+        if current["alloc_bytes_per_call"] > max_alloc:
+            regressions.append(
+                f"{key}: {current['alloc_bytes_per_call']:.0f} B/call allocated, "
+                f"baseline {previous['alloc_bytes_per_call']:.0f} B/call"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark helper_functions")
+    parser.add_argument(
+        "--scales",
+        default=",".join(str(s) for s in DEFAULT_SCALES),
+        help="Comma-separated catalog sizes",
+    )
+    parser.add_argument(
+        "--min-time", type=float, default=0.2, help="Seconds per timing sample"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=7, help="Timing samples per case (median)"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.3,
+        help="Allowed slowdown / allocation growth as a fraction",
+    )
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    results = run_benchmarks(scales, args.min_time, args.repeat)
+
+    print(f"{'benchmark':<40}{'ops/sec':>14}{'B/call':>10}")
+    for key, stats in results.items():
+        print(
+            f"{key:<40}{stats['ops_per_sec']:>14,.0f}"
+            f"{stats['alloc_bytes_per_call']:>10,.0f}"
+        )
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+            f.write("\n")
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --save-baseline first")
+        return
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+
+    regressions = compare_with_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print("\nPerformance regressions:")
+        for message in regressions:
+            print(f"  {message}")
+        sys.exit(1)
+
+    print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
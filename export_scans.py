@@ -0,0 +1,281 @@
+"""Stream the scan history into columnar files for offline analysis
+
+Reads scans from a ScanHistory database in batches and writes them as
+Parquet (or Arrow IPC) record batches with a fixed schema: one row per
+analyzed product with its ingredients, allergens, normalised nutrition per
+100 g and per serving, WHO flags, AI score and condition hits. Memory use
+depends on the batch size, not on the size of the history.
+
+    python export_scans.py history.db scans.parquet
+    python export_scans.py history.db exports/ --rows-per-file 100000
+    python export_scans.py history.db scans.arrow --format arrow
+
+Read back with pandas:
+
+    pd.read_parquet("exports/", columns=["product_name", "sodium_mg_per_100g"])
+
+Requires pyarrow (pip install pyarrow).
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from helper_functions import (
+    NUTRIENT_KEYS,
+    WHO_LIMITS_MG_PER_100G,
+    canonical_nutrient_name,
+    compute_condition_hits,
+    get_rule_pack,
+    parse_nutrient_amount,
+)
+from scan_history import ScanHistory
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency, only needed for exports
+    pa = None
+
+# Bump when columns change; stored in every file's schema metadata
+SCHEMA_VERSION = "2"
+
+# Nutrients with their own columns; anything else goes to other_nutrients
+NUTRIENT_COLUMNS = list(dict.fromkeys(key for _, key in NUTRIENT_KEYS))
+
+FILE_EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def _nutrient_unit(key):
+    return "kcal" if key == "energy" else "mg"
+
+
+def build_schema():
+    """Arrow schema shared by every export file"""
+    if pa is None:
+        raise RuntimeError("Exports need pyarrow: pip install pyarrow")
+
+    fields = [
+        pa.field("scan_id", pa.int64(), nullable=False),
+        pa.field("content_hash", pa.string()),
+        pa.field("scanned_at", pa.timestamp("ms", tz="UTC")),
+        pa.field("product_name", pa.string()),
+        pa.field("net_weight_g", pa.float64()),
+        pa.field("score", pa.int64()),
+        pa.field("verdict", pa.string()),
+        pa.field("scan_rules_version", pa.string()),
+        pa.field("ingredients", pa.list_(pa.string())),
+        pa.field("ingredient_count", pa.int32()),
+        pa.field("allergens", pa.list_(pa.string())),
+    ]
+    for key in NUTRIENT_COLUMNS:
+        unit = _nutrient_unit(key)
+        fields.append(pa.field(f"{key}_{unit}_per_100g", pa.float64()))
+        fields.append(pa.field(f"{key}_{unit}_per_serve", pa.float64()))
+    fields.append(pa.field("other_nutrients", pa.map_(pa.string(), pa.float64())))
+    for key in WHO_LIMITS_MG_PER_100G:
+        fields.append(pa.field(f"who_{key}_exceeded", pa.bool_()))
+    fields += [
+        pa.field("who_flag_count", pa.int32()),
+        pa.field("condition_hits", pa.int64()),
+        pa.field("conditions_hit", pa.list_(pa.string())),
+        pa.field("warnings", pa.list_(pa.string())),
+    ]
+
+    pack = get_rule_pack()
+    metadata = {
+        "truthinbite_schema_version": SCHEMA_VERSION,
+        "rules_version": pack.version,
+        # condition_hits bit i is conditions[i]
+        "conditions": json.dumps(pack.condition_names(), ensure_ascii=False),
+    }
+    return pa.schema(fields, metadata=metadata)
+
+
+def scan_to_row(scan, pack=None):
+    """Flatten one ScanHistory scan into a row matching build_schema()"""
+    pack = pack or get_rule_pack()
+    product = scan["product"] or {}
+    summary = scan["summary"] or {}
+
+    net_weight = product.get("net_weight")
+    if not isinstance(net_weight, (int, float)) or net_weight <= 0:
+        net_weight = None
+
+    # Normalised amounts stored at scan time, or parsed here if not loaded
+    nutrients = scan.get("nutrients")
+    if nutrients is None:
+        nutrients = {}
+        for fact in product.get("nutrition_facts") or []:
+            if not isinstance(fact, dict):
+                continue
+            amount, _ = parse_nutrient_amount(fact.get("Value"))
+            if amount is not None:
+                nutrients.setdefault(canonical_nutrient_name(fact.get("Nutrient")), amount)
+
+    per_100g = {}
+    other = {}
+    for key, amount in nutrients.items():
+        (per_100g if key in NUTRIENT_COLUMNS else other)[key] = amount
+
+    row = {
+        "scan_id": scan["id"],
+        "content_hash": scan["content_hash"],
+        "scanned_at": datetime.fromtimestamp(scan["scanned_at"], tz=timezone.utc),
+        "product_name": scan["product_name"],
+        "net_weight_g": float(net_weight) if net_weight else None,
+        "score": scan["score"],
+        "verdict": summary.get("verdict"),
+        "scan_rules_version": scan["rules_version"],
+        "ingredients": [
+            str(ing.get("name", ""))
+            for ing in product.get("ingredients") or []
+            if isinstance(ing, dict)
+        ],
+        "allergens": [str(a) for a in product.get("allergens") or []],
+        "other_nutrients": list(other.items()),
+        "warnings": [str(w) for w in scan["warnings"] or []],
+    }
+    row["ingredient_count"] = len(row["ingredients"])
+
+    for key in NUTRIENT_COLUMNS:
+        unit = _nutrient_unit(key)
+        amount = per_100g.get(key)
+        row[f"{key}_{unit}_per_100g"] = amount
+        row[f"{key}_{unit}_per_serve"] = (
+            amount * net_weight / 100 if amount is not None and net_weight else None
+        )
+
+    flags = 0
+    for key, limit in WHO_LIMITS_MG_PER_100G.items():
+        amount = per_100g.get(key)
+        exceeded = None if amount is None else amount > limit
+        row[f"who_{key}_exceeded"] = exceeded
+        flags += bool(exceeded)
+    row["who_flag_count"] = flags
+
+    hits = compute_condition_hits(product, pack)
+    row["condition_hits"] = hits
+    row["conditions_hit"] = [
+        name for name, bit in pack.bits.items() if hits & bit
+    ]
+    return row
+
+
+class _FileSink:
+    """Writes record batches to one or more files of a single format"""
+
+    def __init__(self, path, schema, file_format, rows_per_file):
+        self.path = path
+        self.schema = schema
+        self.file_format = file_format
+        self.rows_per_file = rows_per_file
+        self.files = []
+        self._writer = None
+        self._rows_in_file = 0
+
+        if rows_per_file:
+            os.makedirs(path, exist_ok=True)
+
+    def _open(self):
+        if self.rows_per_file:
+            name = f"part-{len(self.files):05d}{FILE_EXTENSIONS[self.file_format]}"
+            path = os.path.join(self.path, name)
+        else:
+            path = self.path
+
+        if self.file_format == "parquet":
+            self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_file(path, self.schema)
+        self.files.append(path)
+        self._rows_in_file = 0
+
+    def write(self, batch):
+        if self._writer is None:
+            self._open()
+        if self.file_format == "parquet":
+            self._writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self._writer.write_batch(batch)
+        self._rows_in_file += batch.num_rows
+        if self.rows_per_file and self._rows_in_file >= self.rows_per_file:
+            self.close()
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def export_scans(
+    history, path, file_format="parquet", batch_size=5000, rows_per_file=None
+):
+    """Stream every scan into columnar files; returns a summary report
+
+    Each batch of batch_size scans becomes one record batch (a Parquet row
+    group). With rows_per_file, path is a directory of part files.
+    """
+    if file_format not in FILE_EXTENSIONS:
+        raise ValueError(f"Unsupported export format: {file_format}")
+
+    schema = build_schema()
+    pack = get_rule_pack()
+    sink = _FileSink(path, schema, file_format, rows_per_file)
+
+    # Part files must not straddle a batch, so batches never exceed them
+    batch_size = min(batch_size, rows_per_file or batch_size)
+    start = time.perf_counter()
+    total = 0
+    try:
+        for scans in history.iter_scan_batches(batch_size, with_nutrients=True):
+            rows = [scan_to_row(scan, pack) for scan in scans]
+            sink.write(pa.RecordBatch.from_pylist(rows, schema=schema))
+            total += len(rows)
+        if not sink.files:
+            # An empty history still produces a file with the full schema
+            sink.write(pa.RecordBatch.from_pylist([], schema=schema))
+    finally:
+        sink.close()
+
+    return {
+        "rows": total,
+        "files": sink.files,
+        "format": file_format,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the scan history")
+    parser.add_argument("db", help="Path to the history database")
+    parser.add_argument("output", help="Output file, or directory with --rows-per-file")
+    parser.add_argument("--format", choices=sorted(FILE_EXTENSIONS), default="parquet")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument(
+        "--rows-per-file",
+        type=int,
+        default=None,
+        help="Split the export into part files of at most this many rows",
+    )
+    args = parser.parse_args()
+
+    history = ScanHistory(args.db)
+    try:
+        report = export_scans(
+            history, args.output, args.format, args.batch_size, args.rows_per_file
+        )
+    finally:
+        history.close()
+
+    print(
+        f"Exported {report['rows']} scan(s) to {len(report['files'])} "
+        f"{report['format']} file(s) in {report['seconds']}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,213 +1,304 @@
+import hashlib
+import json
+import os
 import re
+import threading
+from collections import namedtuple
 from typing import List, Dict, Optional, Union
 
+from ingredient_index import IngredientIndex, IngredientInfo
+from result_cache import ResultCache, content_key
+
 # Pre-compiled regex patterns
 NUMERIC_PATTERN = re.compile(r"[\d.]+")
 UNIT_PATTERN = re.compile(r"[a-zA-Z]+")
 
-# Comprehensive Indian health condition mappings (same as before)
-HEALTH_CONDITIONS = {
-    # Diabetes variants
-    "Diabetes Type 1": {
-        "keywords": [
-            "sugar",
-            "glucose",
-            "fructose",
-            "syrup",
-            "honey",
-            "jaggery",
-            "corn syrup",
-        ],
-        "message": "Contains sugars - monitor blood glucose carefully",
-    },
-    "Diabetes Type 2": {
-        "keywords": [
-            "sugar",
-            "glucose",
-            "fructose",
-            "refined flour",
-            "maida",
-            "corn starch",
-        ],
-        "message": "High glycemic ingredients present - check with doctor",
-    },
-    "Pre-Diabetes": {
-        "keywords": ["sugar", "glucose", "refined", "processed", "high fructose"],
-        "message": "Contains processed sugars - may affect blood sugar",
-    },
-    # Cardiovascular conditions
-    "High Blood Pressure": {
-        "keywords": [
-            "sodium",
-            "salt",
-            "msg",
-            "monosodium glutamate",
-            "sodium chloride",
-            "baking soda",
-        ],
-        "message": "High sodium content - may increase blood pressure",
-    },
-    "Heart Disease": {
-        "keywords": [
-            "trans fat",
-            "hydrogenated",
-            "saturated fat",
-            "palm oil",
-            "coconut oil",
-        ],
-        "message": "Contains fats that may affect heart health",
-    },
-    "High Cholesterol": {
-        "keywords": [
-            "saturated fat",
-            "trans fat",
-            "cholesterol",
-            "butter",
-            "ghee",
-            "coconut oil",
-        ],
-        "message": "May increase cholesterol levels",
-    },
-    # Organ-specific conditions
-    "Kidney Disease": {
-        "keywords": ["sodium", "potassium", "phosphorus", "protein", "msg"],
-        "message": "May strain kidney function",
-    },
-    "Liver Disease": {
-        "keywords": [
-            "artificial colors",
-            "preservatives",
-            "alcohol",
-            "high fat",
-            "processed",
-        ],
-        "message": "Contains additives that may burden liver",
-    },
-    "Thyroid Issues": {
-        "keywords": ["iodine", "soy", "cruciferous", "goitrogenic", "cabbage"],
-        "message": "May interfere with thyroid function",
-    },
-    # Women's health
-    "PCOD/PCOS": {
-        "keywords": ["sugar", "refined flour", "trans fat", "artificial sweeteners"],
-        "message": "May worsen PCOD/PCOS symptoms",
-    },
-    "Pregnancy": {
-        "keywords": [
-            "artificial sweeteners",
-            "high mercury",
-            "raw",
-            "unpasteurized",
-            "alcohol",
-        ],
-        "message": "Not recommended during pregnancy",
-    },
-    "Breastfeeding": {
-        "keywords": ["caffeine", "alcohol", "artificial colors", "msg"],
-        "message": "May affect milk quality - consult doctor",
-    },
-    # Digestive conditions
-    "Gastric Issues": {
-        "keywords": ["spicy", "acidic", "citric acid", "vinegar", "chili", "pepper"],
-        "message": "May trigger gastric problems",
-    },
-    "IBS": {
-        "keywords": ["lactose", "gluten", "artificial sweeteners", "high fat", "spicy"],
-        "message": "May trigger IBS symptoms",
-    },
-    # Allergies
-    "Nut Allergy": {
-        "keywords": [
-            "nut",
-            "almond",
-            "cashew",
-            "peanut",
-            "walnut",
-            "hazelnut",
-            "pistachio",
-        ],
-        "message": "Contains nuts - severe allergy risk",
-    },
-    "Gluten Sensitivity": {
-        "keywords": ["wheat", "barley", "rye", "gluten", "flour", "malt", "semolina"],
-        "message": "Contains gluten - may cause sensitivity reaction",
-    },
-    "Lactose Intolerance": {
-        "keywords": ["milk", "lactose", "dairy", "whey", "casein", "butter", "cheese"],
-        "message": "Contains dairy - may cause digestive issues",
-    },
-    "Soy Allergy": {
-        "keywords": ["soy", "soybean", "lecithin", "tofu", "soya"],
-        "message": "Contains soy - allergy risk",
-    },
-    "Egg Allergy": {
-        "keywords": ["egg", "albumin", "lecithin", "mayonnaise"],
-        "message": "Contains egg - allergy risk",
-    },
-    # Lifestyle conditions
-    "Weight Management": {
-        "keywords": ["high calorie", "sugar", "saturated fat", "trans fat", "refined"],
-        "message": "High calorie - may affect weight management",
-    },
-    "Muscle Building": {
-        "keywords": ["low protein", "high sugar", "processed", "artificial"],
-        "message": "Not optimal for muscle building goals",
-    },
-    # Age-specific
-    "Child (2-12 years)": {
-        "keywords": [
-            "artificial colors",
-            "high sugar",
-            "caffeine",
-            "preservatives",
-            "msg",
-        ],
-        "message": "May not be suitable for children",
-    },
-    "Elderly (60+)": {
-        "keywords": ["high sodium", "hard to digest", "artificial", "high sugar"],
-        "message": "May not be suitable for elderly",
-    },
-    # Dietary preferences
-    "Vegetarian": {
-        "keywords": ["gelatin", "animal fat", "lard", "chicken", "beef", "fish"],
-        "message": "Contains non-vegetarian ingredients",
-    },
-    "Vegan": {
-        "keywords": ["milk", "dairy", "honey", "gelatin", "whey", "casein", "egg"],
-        "message": "Contains animal-derived ingredients",
-    },
-    "Jain Food": {
-        "keywords": ["onion", "garlic", "potato", "ginger", "root vegetables"],
-        "message": "Contains ingredients not suitable for Jain diet",
-    },
-}
+# Health condition rules live in a versioned data file so they can change
+# without a code deploy
+RULES_PATH = os.getenv(
+    "TRUTHINBITE_RULES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "health_rules.json"),
+)
+
+
+class RulePack:
+    """Validated health-condition rules compiled into keyword matchers"""
+
+    def __init__(self, conditions: List[Dict], source: Optional[str] = None):
+        self.source = source
+        self.mtime = None
+
+        # Name -> {"keywords", "message"}, kept in the pack's display order
+        self.conditions = {
+            item["name"]: {"keywords": item["keywords"], "message": item["message"]}
+            for item in conditions
+        }
+
+        # One alternation per condition; longest keywords first
+        self.matchers = {
+            name: re.compile(
+                "|".join(
+                    re.escape(keyword)
+                    for keyword in sorted(data["keywords"], key=len, reverse=True)
+                )
+            )
+            for name, data in self.conditions.items()
+        }
+
+        # Bit i of a hit mask / profile mask stands for the i-th condition
+        self.bits = {name: 1 << i for i, name in enumerate(self.conditions)}
+        self.warning_table = [
+            f"🚨 {name}: {data['message']}" for name, data in self.conditions.items()
+        ]
+        self.bit_matchers = [
+            (self.bits[name], matcher) for name, matcher in self.matchers.items()
+        ]
+
+        canonical = json.dumps(conditions, sort_keys=True, ensure_ascii=False)
+        self.version = hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+    def condition_names(self) -> List[str]:
+        return list(self.conditions)
+
+    def encode_profile(self, health_profile: List[str]) -> int:
+        """Bitmask of the profile's conditions (unknown names are ignored)"""
+        mask = 0
+        for condition in health_profile or []:
+            mask |= self.bits.get(condition, 0)
+        return mask
+
+    def cache_key(self, *parts) -> str:
+        """Cache key for results derived from these rules"""
+        return content_key(self.version, *parts)
+
+
+def _validate_rule_pack(data) -> List[Dict]:
+    """Check rule-pack structure and return normalised condition entries"""
+    if not isinstance(data, dict) or not isinstance(data.get("conditions"), list):
+        raise ValueError("Rule pack must be an object with a 'conditions' list")
+    if not data["conditions"]:
+        raise ValueError("Rule pack has no conditions")
+
+    conditions = []
+    seen = set()
+    for index, item in enumerate(data["conditions"]):
+        if not isinstance(item, dict):
+            raise ValueError(f"Condition #{index} is not an object")
+
+        name = item.get("name")
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError(f"Condition #{index} has no name")
+        if name in seen:
+            raise ValueError(f"Duplicate condition: {name}")
+        seen.add(name)
+
+        keywords = item.get("keywords")
+        if (
+            not isinstance(keywords, list)
+            or not keywords
+            or not all(isinstance(k, str) and k.strip() for k in keywords)
+        ):
+            raise ValueError(f"{name}: keywords must be a non-empty list of strings")
+
+        message = item.get("message")
+        if not isinstance(message, str) or not message.strip():
+            raise ValueError(f"{name}: message is required")
+
+        conditions.append(
+            {
+                "name": name,
+                "keywords": [k.strip().lower() for k in keywords],
+                "message": message,
+            }
+        )
+
+    return conditions
+
+
+def load_rule_pack(path: str = RULES_PATH) -> RulePack:
+    """Load, validate and compile a rule pack from a JSON file"""
+    mtime = os.path.getmtime(path)
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    pack = RulePack(_validate_rule_pack(data), source=path)
+    pack.mtime = mtime
+    return pack
+
+
+_active_pack = load_rule_pack()
+_reload_lock = threading.Lock()
+_rejected_mtime = None
+
+# Name -> {"keywords", "message"} for the active pack (kept for compatibility)
+HEALTH_CONDITIONS = _active_pack.conditions
+
+
+def get_rule_pack() -> RulePack:
+    """Currently active rule pack"""
+    return _active_pack
+
+
+def get_condition_names() -> List[str]:
+    """Health conditions offered by the active rule pack, in display order"""
+    return _active_pack.condition_names()
+
+
+def reload_rule_pack(path: Optional[str] = None) -> RulePack:
+    """Load a new rule pack and swap it in atomically
+
+    The old pack stays active if the new one fails validation. Caches keyed
+    by RulePack.cache_key pick up the new version; unrelated caches are
+    untouched.
+    """
+    global _active_pack, HEALTH_CONDITIONS
+
+    with _reload_lock:
+        pack = load_rule_pack(path or _active_pack.source or RULES_PATH)
+        _active_pack = pack
+        HEALTH_CONDITIONS = pack.conditions
+    return pack
+
+
+def maybe_reload_rule_pack() -> RulePack:
+    """Reload the active pack if its file changed on disk"""
+    global _rejected_mtime
+
+    pack = _active_pack
+    mtime = None
+    try:
+        mtime = os.path.getmtime(pack.source) if pack.source else None
+        if mtime is not None and mtime not in (pack.mtime, _rejected_mtime):
+            pack = reload_rule_pack(pack.source)
+    except (OSError, ValueError) as e:
+        if mtime == _rejected_mtime:
+            return pack
+        # Report a broken file once, not on every rerun
+        _rejected_mtime = mtime
+        print(f"Keeping rule pack {pack.version}: {e}")
+    return pack
+
+
+# Condition-hit masks per extracted product list, keyed by rule version +
+# list content
+_hits_cache = ResultCache("condition_hits", max_entries=4096)
+
+# Every distinct ingredient / allergen string is classified once per process
+_ingredient_index = IngredientIndex()
+
+
+def classify_ingredient(name: str) -> IngredientInfo:
+    """Cached classification of an ingredient name under the active rules"""
+    return _ingredient_index.classify(name, get_rule_pack())
+
+
+def ingredient_index_stats() -> Dict:
+    return _ingredient_index.stats()
+
+
+def compute_condition_hits(product: Dict, pack: Optional[RulePack] = None) -> int:
+    """Bitmask of every condition in the pack whose keywords the product hits
+
+    The OR of the cached per-ingredient and per-allergen masks, so each
+    distinct name is only matched against the rules once.
+    """
+    pack = pack or get_rule_pack()
+    if not product:
+        return 0
 
+    hits = 0
+    for ing in product.get("ingredients", []):
+        hits |= _ingredient_index.classify(ing.get("name", ""), pack).condition_hits
+    for allergen in product.get("allergens", []):
+        hits |= _ingredient_index.classify(allergen, pack).condition_hits
+    return hits
 
-def run_health_analysis(product: Dict, health_profile: List[str]) -> List[str]:
-    """Enhanced health analysis for Indian health conditions"""
+
+class ConditionHits(namedtuple("ConditionHits", ["rules_version", "mask"])):
+    """A product's condition-hit mask and the rule version that encoded it
+
+    Bit positions only mean something under that version: a reload can
+    reorder or drop conditions, so stale masks are recomputed, not decoded.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def of(cls, product: Dict, pack: Optional[RulePack] = None) -> "ConditionHits":
+        pack = pack or get_rule_pack()
+        return cls(pack.version, compute_condition_hits(product, pack))
+
+
+def get_condition_hits(product_list: List[Dict]) -> List[ConditionHits]:
+    """Hit masks for an extracted product list, computed once per rule version
+
+    Called at extraction time so later profile changes only need bitwise
+    operations. Keyed by the list's content, not the label it came from:
+    a retried or merged extraction of the same label gets fresh masks. A
+    rule-pack reload changes the key too, so masks are recomputed lazily.
+    """
+    pack = get_rule_pack()
+    key = pack.cache_key("condition_hits", product_list)
+    hits = _hits_cache.get(key)
+    if hits is None:
+        hits = [ConditionHits.of(product, pack) for product in product_list]
+        _hits_cache.put(key, hits)
+    return hits
+
+
+def warnings_from_hits(
+    hits: int, profile_mask: int, pack: Optional[RulePack] = None
+) -> List[str]:
+    """Warning messages for the conditions set in both masks"""
+    pack = pack or get_rule_pack()
+    matched = hits & profile_mask
+    warnings = []
+    while matched:
+        low_bit = matched & -matched
+        warnings.append(pack.warning_table[low_bit.bit_length() - 1])
+        matched ^= low_bit
+    return warnings
+
+
+def run_health_analysis(
+    product: Dict,
+    health_profile: List[str],
+    condition_hits: Optional[ConditionHits] = None,
+) -> List[str]:
+    """Enhanced health analysis for Indian health conditions
+
+    Pass condition_hits (from get_condition_hits) to skip the ingredient
+    lookups; hits encoded under another rule version are recomputed.
+    """
     if not health_profile or not product:
         return []
 
-    warnings = set()
+    pack = get_rule_pack()
+    profile_mask = pack.encode_profile(health_profile)
+    if condition_hits is None or condition_hits.rules_version != pack.version:
+        mask = compute_condition_hits(product, pack)
+    else:
+        mask = condition_hits.mask
 
-    # Combine all text for analysis
-    ingredient_names = " ".join(
-        ing.get("name", "").lower() for ing in product.get("ingredients", [])
-    )
-    allergen_info = " ".join(product.get("allergens", [])).lower()
-    combined_text = f"{ingredient_names} {allergen_info}"
+    return warnings_from_hits(mask, profile_mask, pack)
 
-    # Check each health condition
-    for condition in health_profile:
-        if condition in HEALTH_CONDITIONS:
-            condition_data = HEALTH_CONDITIONS[condition]
 
-            # Check if any keywords match
-            if any(keyword in combined_text for keyword in condition_data["keywords"]):
-                warnings.add(f"🚨 {condition}: {condition_data['message']}")
+def personalize_summary(
+    summary: Dict,
+    product: Dict,
+    health_profile: List[str],
+    condition_hits: Optional[ConditionHits] = None,
+) -> Dict:
+    """Profile-specific view of a shared, profile-independent AI summary
 
-    return list(warnings)
+    Returns a copy with "profile_warnings" from the rule pack; the cached
+    summary itself is never modified.
+    """
+    personalized = dict(summary or {})
+    personalized["profile_warnings"] = run_health_analysis(
+        product, health_profile, condition_hits
+    )
+    return personalized
 
 
 def calculate_per_serve_nutrition(
@@ -319,3 +410,180 @@ def check_who_compliance(nutrition_facts: List[Dict]) -> List[str]:
         compliance_issues.append("✅ Meets WHO nutritional guidelines")
 
     return compliance_issues
+
+
+# Canonical keys for nutrient labels, checked in order (first match wins).
+# Patterns are whole-word regexes, so the more specific forms ("mono-
+# unsaturated", "sugar alcohols", "energy from fat") must come before the
+# general ones they contain.
+NUTRIENT_KEYS = [
+    (r"mono[\s-]?unsaturated|mufa", "monounsaturated_fat"),
+    (r"poly[\s-]?unsaturated|pufa", "polyunsaturated_fat"),
+    (r"unsaturated", "unsaturated_fat"),
+    (r"saturated|saturates", "saturated_fat"),
+    (r"trans", "trans_fat"),
+    (r"(?:energy|calories) from fat", "energy_from_fat"),
+    (r"sugar alcohols?|polyols?", "sugar_alcohols"),
+    (r"added sugars?", "added_sugars"),
+    (r"sugars?", "total_sugars"),
+    (r"insoluble (?:fiber|fibre)s?", "insoluble_fiber"),
+    (r"soluble (?:fiber|fibre)s?", "soluble_fiber"),
+    (r"(?:fiber|fibre)s?", "dietary_fiber"),
+    (r"carbohydrates?|carbs", "carbohydrates"),
+    (r"fats?", "total_fat"),
+    (r"sodium", "sodium"),
+    (r"cholesterol", "cholesterol"),
+    (r"proteins?", "protein"),
+    (r"energy", "energy"),
+    (r"calories?", "energy"),
+]
+_NUTRIENT_MATCHERS = [
+    (re.compile(r"\b(?:" + pattern + r")\b"), key) for pattern, key in NUTRIENT_KEYS
+]
+
+# Conversion factors to milligrams for mass units
+MASS_UNITS_MG = {"kg": 1_000_000, "g": 1000, "mg": 1, "mcg": 0.001, "ug": 0.001}
+
+# The check_who_compliance limits in normalised units (mg per 100 g)
+WHO_LIMITS_MG_PER_100G = {
+    "saturated_fat": 10_000,
+    "trans_fat": 1_000,
+    "sodium": 500,
+    "total_sugars": 12_000,
+    "added_sugars": 6_000,
+}
+
+
+def canonical_nutrient_name(name: str) -> str:
+    """Map a label's nutrient name to a stable key, e.g. 'total_sugars'"""
+    lowered = str(name or "").lower()
+    for matcher, key in _NUTRIENT_MATCHERS:
+        if matcher.search(lowered):
+            return key
+    return re.sub(r"[^a-z0-9]+", "_", lowered).strip("_")
+
+
+def parse_nutrient_amount(value_str: str) -> tuple:
+    """Parse '150mg' / '2.5 g' / '200 kcal' into a normalised (amount, unit)
+
+    Mass values are converted to milligrams and energy to kcal. Returns
+    (None, "") when no number can be read.
+    """
+    value_str = str(value_str or "")
+    numeric_match = NUMERIC_PATTERN.search(value_str)
+    if not numeric_match:
+        return (None, "")
+
+    try:
+        amount = float(numeric_match.group())
+    except ValueError:
+        return (None, "")
+
+    unit = "".join(UNIT_PATTERN.findall(value_str)).lower()
+    if unit in MASS_UNITS_MG:
+        return (amount * MASS_UNITS_MG[unit], "mg")
+    if unit == "kj":
+        return (amount / 4.184, "kcal")
+    return (amount, unit)
+
+
+def _normalize_label(text) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", str(text or "").lower()).strip()
+
+
+def _normalize_product_name(name) -> str:
+    return _normalize_label(name)
+
+
+def _parse_net_weight(value) -> Optional[float]:
+    try:
+        weight = float(value)
+    except (TypeError, ValueError):
+        return None
+    return weight if weight > 0 else None
+
+
+def _merge_into(merged: Dict, partial: Dict) -> None:
+    """Fold one partial product record into a merged one (first value wins)"""
+    name = partial.get("product_name")
+    if _normalize_product_name(name) and len(str(name)) > len(
+        str(merged.get("product_name") or "")
+    ):
+        merged["product_name"] = name
+    if _parse_net_weight(partial.get("net_weight")) is not None and (
+        _parse_net_weight(merged.get("net_weight")) is None
+    ):
+        merged["net_weight"] = partial["net_weight"]
+    for key, value in partial.items():
+        if key not in merged:
+            merged[key] = value
+
+    seen = {
+        str(ing.get("name") or "").strip().lower() for ing in merged["ingredients"]
+    }
+    for ing in partial.get("ingredients") or []:
+        if not isinstance(ing, dict):
+            continue
+        key = str(ing.get("name") or "").strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            merged["ingredients"].append(ing)
+
+    # Exact labels, not canonical keys: "Soluble Fibre" and "Dietary Fibre"
+    # are both kept, the same row read from two images is not
+    seen = {
+        _normalize_label(fact.get("Nutrient")) for fact in merged["nutrition_facts"]
+    }
+    for fact in partial.get("nutrition_facts") or []:
+        if not isinstance(fact, dict):
+            continue
+        key = _normalize_label(fact.get("Nutrient"))
+        if key and key not in seen:
+            seen.add(key)
+            merged["nutrition_facts"].append(fact)
+
+    seen = {str(a).strip().lower() for a in merged["allergens"]}
+    for allergen in partial.get("allergens") or []:
+        key = str(allergen).strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            merged["allergens"].append(allergen)
+
+
+def merge_partial_products(partials: List[List[Dict]]) -> List[Dict]:
+    """Merge products extracted from several images of the same packet(s)
+
+    Records are grouped by normalised product name and net weight. A record
+    missing either field (e.g. a back label with only nutrition facts) joins
+    the first group it does not contradict, so the front and back of one
+    packet become a single complete product.
+    """
+    groups = []  # [name, weight, merged record]
+    for product_list in partials:
+        for product in product_list or []:
+            if not isinstance(product, dict):
+                continue
+            name = _normalize_product_name(product.get("product_name"))
+            weight = _parse_net_weight(product.get("net_weight"))
+
+            for group in groups:
+                if (not name or not group[0] or name == group[0]) and (
+                    weight is None or group[1] is None or weight == group[1]
+                ):
+                    break
+            else:
+                merged = {
+                    "product_name": None,
+                    "net_weight": None,
+                    "ingredients": [],
+                    "nutrition_facts": [],
+                    "allergens": [],
+                }
+                group = ["", None, merged]
+                groups.append(group)
+
+            _merge_into(group[2], product)
+            group[0] = group[0] or name
+            group[1] = group[1] if group[1] is not None else weight
+
+    return [group[2] for group in groups]
@@ -0,0 +1,63 @@
+import hashlib
+import io
+from collections import namedtuple
+
+from PIL import Image
+
+from result_cache import ResultCache
+
+# Longest side kept for on-page display and for the model upload
+DISPLAY_MAX_SIZE = (640, 640)
+UPLOAD_MAX_SIZE = (1600, 1600)
+
+DISPLAY_JPEG_QUALITY = 85
+
+# display: JPEG bytes ready for st.image, upload: reduced PIL image for the model
+DecodedLabel = namedtuple("DecodedLabel", ["key", "display", "upload"])
+
+_decoded_cache = ResultCache("decoded_images", max_entries=64)
+
+
+def content_hash(data: bytes) -> str:
+    """SHA-256 of the raw uploaded bytes, used as the image identity"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _decode_reduced(data: bytes, max_size: tuple) -> Image.Image:
+    """Decode an image no larger than max_size
+
+    For JPEGs, draft() makes the decoder produce a 1/2, 1/4 or 1/8 scale
+    image directly, so the full-resolution bitmap is never materialised.
+    Other formats ignore draft() and are downscaled after decoding.
+    """
+    image = Image.open(io.BytesIO(data))
+    image.draft("RGB", max_size)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    image.thumbnail(max_size)
+    return image
+
+
+def load_label_image(data: bytes) -> DecodedLabel:
+    """Decode an uploaded label once and reuse it across reruns and sessions"""
+    key = content_hash(data)
+    decoded = _decoded_cache.get(key)
+    if decoded is not None:
+        return decoded
+
+    upload = _decode_reduced(data, UPLOAD_MAX_SIZE)
+
+    thumbnail = upload.copy()
+    thumbnail.thumbnail(DISPLAY_MAX_SIZE)
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, format="JPEG", quality=DISPLAY_JPEG_QUALITY)
+
+    decoded = DecodedLabel(key, buffer.getvalue(), upload)
+    pixel_bytes = upload.width * upload.height * len(upload.getbands())
+    _decoded_cache.put(key, decoded, size=len(decoded.display) + pixel_bytes)
+    return decoded
+
+
+def get_cached_label(key: str):
+    """Previously decoded label for a content hash, or None if evicted"""
+    return _decoded_cache.get(key)
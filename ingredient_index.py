@@ -0,0 +1,156 @@
+"""Process-wide interned ingredient dictionary
+
+The same ingredient strings ("sugar", "palm oil", "refined wheat flour
+(maida)") appear on thousands of labels. Each distinct name is normalised
+once, given a small integer ID and classified once (condition hits,
+concerning/natural flags, additive category); every later product only
+does a dictionary lookup per ingredient.
+"""
+
+import os
+import re
+import sys
+import threading
+from collections import namedtuple
+
+# Ingredient terms flagged in the Ingredients tab
+CONCERNING_TERMS = [
+    "artificial",
+    "synthetic",
+    "modified",
+    "hydrogenated",
+    "trans",
+    "msg",
+    "aspartame",
+    "acesulfame",
+]
+NATURAL_TERMS = ["whole", "organic", "natural", "pure", "fresh"]
+
+# Additive categories, checked in order (first match wins)
+ADDITIVE_CATEGORIES = [
+    ("sweetener", ["aspartame", "acesulfame", "sucralose", "saccharin", "sweetener"]),
+    (
+        "flavour enhancer",
+        ["msg", "monosodium glutamate", "flavour enhancer", "flavor enhancer", "621"],
+    ),
+    (
+        "preservative",
+        ["preservative", "benzoate", "sorbate", "nitrite", "sulphite", "bha", "bht"],
+    ),
+    ("colour", ["colour", "color", "tartrazine", "caramel"]),
+    ("emulsifier", ["emulsifier", "lecithin", "mono- and diglycerides"]),
+    ("stabiliser", ["stabiliser", "stabilizer", "thickener", "gum", "pectin"]),
+    ("acidity regulator", ["acidity regulator", "citric acid", "lactic acid"]),
+    ("raising agent", ["raising agent", "leavening", "bicarbonate"]),
+    ("flavouring", ["flavour", "flavor"]),
+]
+
+# Whole-word matchers ("gum" must not match "legumes"); plural and
+# -ed/-ing endings allowed
+_ADDITIVE_MATCHERS = [
+    (
+        category,
+        re.compile(
+            r"\b(?:"
+            + "|".join(re.escape(term) for term in terms)
+            + r")(?:s|ed|ing)?\b"
+        ),
+    )
+    for category, terms in ADDITIVE_CATEGORIES
+]
+
+# Distinct names kept; beyond this, new names are classified but not stored
+# and get no ID
+MAX_INGREDIENTS = int(os.getenv("TRUTHINBITE_MAX_INGREDIENTS", "50000"))
+
+IngredientInfo = namedtuple(
+    "IngredientInfo",
+    ["id", "name", "condition_hits", "concerning", "natural", "additive_category"],
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_ingredient(name) -> str:
+    """Lowercased, whitespace-collapsed ingredient name"""
+    return _WHITESPACE.sub(" ", str(name or "").lower()).strip()
+
+
+def _additive_category(name):
+    for category, matcher in _ADDITIVE_MATCHERS:
+        if matcher.search(name):
+            return category
+    return None
+
+
+class IngredientIndex:
+    """Canonical IDs and cached classifications for every ingredient seen
+
+    Classifications depend on the rule pack, so the index starts over when
+    it is asked about a different rule version.
+    """
+
+    def __init__(self, max_entries=MAX_INGREDIENTS):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, rules_version):
+        # Version and table are swapped together so readers never mix them
+        self._table = (rules_version, {})
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def rules_version(self):
+        return self._table[0]
+
+    def classify(self, name, pack) -> IngredientInfo:
+        """Classification of one ingredient (or allergen) name under `pack`"""
+        normalized = normalize_ingredient(name)
+        version, by_name = self._table
+        if version == pack.version:
+            info = by_name.get(normalized)
+            if info is not None:
+                self.hits += 1
+                return info
+
+        condition_hits = 0
+        for bit, matcher in pack.bit_matchers:
+            if matcher.search(normalized):
+                condition_hits |= bit
+
+        with self._lock:
+            if self.rules_version != pack.version:
+                self._reset(pack.version)
+            by_name = self._table[1]
+            info = by_name.get(normalized)
+            if info is not None:
+                return info
+
+            self.misses += 1
+            stored = len(by_name) < self.max_entries
+            if stored:
+                normalized = sys.intern(normalized)
+            info = IngredientInfo(
+                id=len(by_name) if stored else None,
+                name=normalized,
+                condition_hits=condition_hits,
+                concerning=any(term in normalized for term in CONCERNING_TERMS),
+                natural=any(term in normalized for term in NATURAL_TERMS),
+                additive_category=_additive_category(normalized),
+            )
+            if stored:
+                by_name[normalized] = info
+            return info
+
+    def __len__(self):
+        return len(self._table[1])
+
+    def stats(self):
+        return {
+            "ingredients": len(self),
+            "rules_version": self.rules_version,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
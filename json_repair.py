@@ -0,0 +1,242 @@
+"""Tolerant parsing of JSON returned by the model
+
+Model output is usually valid JSON wrapped in prose or code fences, but a
+trailing comma, a missing comma, Python literals or a response cut off by
+the token limit used to throw the whole (paid) call away. parse_model_json
+repairs the common slips locally and, for truncated output, keeps the
+longest balanced prefix, e.g. every complete element of an array.
+
+Every parse is counted as clean, repaired, partial or failed; see
+repair_stats().
+"""
+
+import json
+import re
+import threading
+
+CLEAN = "clean"
+REPAIRED = "repaired"
+PARTIAL = "partial"
+FAILED = "failed"
+
+_FENCE = re.compile(r"```(?:json)?", re.IGNORECASE)
+
+_TOKEN = re.compile(
+    r"""
+    (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<open_string>"(?:[^"\\]|\\.)*\\?$)
+  | (?P<number>-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<word>[A-Za-z_]+)
+  | (?P<punct>[{}\[\],:])
+  | (?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+_LITERALS = {
+    "true": "true",
+    "false": "false",
+    "null": "null",
+    "True": "true",
+    "False": "false",
+    "None": "null",
+}
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+# Bracket positions tried per kind before giving up on a response
+MAX_CANDIDATES = 16
+
+_stats = {CLEAN: 0, REPAIRED: 0, PARTIAL: 0, FAILED: 0}
+_stats_lock = threading.Lock()
+
+
+def _escape_control_chars(string_token):
+    """Escape raw newlines/tabs that models sometimes leave inside strings"""
+    for raw, escaped in (("\n", "\\n"), ("\r", "\\r"), ("\t", "\\t")):
+        string_token = string_token.replace(raw, escaped)
+    return string_token
+
+
+def repair_json(text):
+    """Best-effort valid JSON for the value starting at text[0]
+
+    Returns (json_text, truncated) or (None, False) when nothing balanced
+    could be recovered. truncated is True when the value had to be cut back:
+    to the last complete element of a top-level array if there is one,
+    otherwise to the last complete nested value.
+    """
+    tokens = []
+    stack = []
+    # "open", "comma", "colon", "key" or "value": what the last token was
+    prev = None
+    # (token count, open containers) after the last complete value, and
+    # after the last complete element of a top-level array
+    safe = None
+    element_safe = None
+
+    def value_start():
+        nonlocal prev
+        if prev == "value" and stack:
+            tokens.append(",")  # missing comma between two values
+            prev = "comma"
+        elif prev == "key":
+            tokens.append(":")  # missing colon after a key
+            prev = "colon"
+
+    def value_end():
+        nonlocal prev, safe, element_safe
+        prev = "value"
+        safe = (len(tokens), list(stack))
+        if stack == ["["]:
+            element_safe = safe
+
+    for match in _TOKEN.finditer(text):
+        kind = match.lastgroup
+        token = match.group()
+
+        if kind == "punct" and token in "{[":
+            value_start()
+            tokens.append(token)
+            stack.append(token)
+            prev = "open"
+        elif kind == "punct" and token in "}]":
+            if not stack:
+                break
+            # Drop a trailing comma, or a key left without a value
+            while tokens and prev in ("comma", "colon", "key"):
+                dropped = tokens.pop()
+                if dropped == ",":
+                    prev = "value"
+                elif dropped == ":":
+                    prev = "key"
+                else:
+                    prev = "comma" if tokens[-1] == "," else "open"
+            tokens.append(_CLOSERS[stack.pop()])
+            value_end()
+            if not stack:
+                break
+        elif token == ",":
+            if prev not in ("comma", "open", None):
+                tokens.append(token)
+                prev = "comma"
+        elif token == ":":
+            if prev == "key":
+                tokens.append(token)
+                prev = "colon"
+        elif kind == "string":
+            value_start()
+            tokens.append(_escape_control_chars(token))
+            if stack and stack[-1] == "{" and prev in ("open", "comma"):
+                prev = "key"
+            else:
+                value_end()
+        elif kind == "number" or (kind == "word" and token in _LITERALS):
+            if stack and stack[-1] == "{" and prev in ("open", "comma"):
+                continue  # a bare key; skip it rather than guess
+            value_start()
+            tokens.append(_LITERALS.get(token, token))
+            value_end()
+        elif kind == "open_string":
+            break
+        # Anything else outside a string is prose; ignore it
+
+    if not stack and tokens:
+        return "".join(tokens), False
+    if safe is None:
+        return None, False
+
+    # Whole array elements beat a half-finished last element
+    count, open_containers = element_safe or safe
+    kept = tokens[:count]
+    return "".join(kept) + "".join(
+        _CLOSERS[opener] for opener in reversed(open_containers)
+    ), True
+
+
+def _strip_wrapping(text):
+    return _FENCE.sub("", str(text or "")).strip()
+
+
+def _coerce(value, expect):
+    """Accept a lone object where a list was asked for, and vice versa"""
+    if expect is list and isinstance(value, dict):
+        return [value]
+    if expect is dict and isinstance(value, list) and value:
+        if isinstance(value[0], dict):
+            return value[0]
+    return value if isinstance(value, expect) else None
+
+
+def _record(status):
+    with _stats_lock:
+        _stats[status] += 1
+
+
+def _candidate_starts(text, bracket):
+    """Positions of bracket in text, first MAX_CANDIDATES of them"""
+    starts = []
+    start = text.find(bracket)
+    while start != -1 and len(starts) < MAX_CANDIDATES:
+        starts.append(start)
+        start = text.find(bracket, start + 1)
+    return starts
+
+
+def parse_model_json(text, expect=list, accept=None):
+    """Parse model output expected to hold a JSON list or object
+
+    Returns (value, status). status is CLEAN when a bracket-to-last-bracket
+    slice parses as is, REPAIRED after syntax fixes, PARTIAL when only a
+    balanced prefix was kept, and FAILED (value None) when nothing usable
+    was found. Empty values never count as usable, and accept(value) can
+    reject the wrong shape; either way a later bracket (prose before the
+    JSON may contain some) is tried next.
+    """
+    text = _strip_wrapping(text)
+    opener = "[" if expect is list else "{"
+    other = "{" if opener == "[" else "["
+
+    def usable(value):
+        value = _coerce(value, expect)
+        if not value or (accept is not None and not accept(value)):
+            return None
+        return value
+
+    for bracket in (opener, other):
+        end = text.rfind(_CLOSERS[bracket]) + 1
+        for start in _candidate_starts(text, bracket):
+            if end > start:
+                try:
+                    value = usable(json.loads(text[start:end]))
+                except json.JSONDecodeError:
+                    value = None
+                if value is not None:
+                    _record(CLEAN)
+                    return value, CLEAN
+
+            repaired, truncated = repair_json(text[start:])
+            if repaired is None:
+                continue
+            try:
+                value = usable(json.loads(repaired))
+            except json.JSONDecodeError:
+                continue
+            if value is not None:
+                status = PARTIAL if truncated else REPAIRED
+                _record(status)
+                return value, status
+
+    _record(FAILED)
+    return None, FAILED
+
+
+def repair_stats():
+    """Parse outcome counts and the share of responses that needed repair"""
+    with _stats_lock:
+        stats = dict(_stats)
+    total = sum(stats.values())
+    recovered = stats[REPAIRED] + stats[PARTIAL]
+    stats["total"] = total
+    stats["repair_rate"] = round(recovered / total, 4) if total else 0.0
+    return stats
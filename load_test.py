@@ -0,0 +1,357 @@
+"""Concurrent-session load test for app.py
+
+Drives N simulated users through the app at once using Streamlit's AppTest,
+all inside this process so they share the same module-level caches a real
+server process would. Each session uploads a label, waits for the
+analysis, switches through every product section and changes the health
+profile. The model is replaced by the stub backend with configurable
+latency, so no network or API key is needed.
+
+    python load_test.py --sessions 20 --iterations 3 --latency 0.8
+
+AppTest skips the websocket and browser rendering, so the numbers measure
+script execution, caching and model wait time - the part that decides how
+many users one process can serve.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import traceback
+import warnings
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+DATASET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "DataSet")
+
+PROFILE_CHOICES = [
+    ["Diabetes Type 2"],
+    ["High Blood Pressure", "Heart Disease"],
+    ["Nut Allergy", "Lactose Intolerance"],
+    ["Vegan", "Jain Food"],
+    [],
+]
+
+MIME_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def current_rss_bytes():
+    """Resident set size of this process (Linux), falling back to peak RSS"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def load_label_files(directory, limit=None):
+    files = sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if os.path.splitext(name)[1].lower() in MIME_TYPES
+    )
+    labels = []
+    for path in files[:limit]:
+        with open(path, "rb") as f:
+            labels.append(
+                (
+                    os.path.basename(path),
+                    f.read(),
+                    MIME_TYPES[os.path.splitext(path)[1].lower()],
+                )
+            )
+    return labels
+
+
+class LoadTestRecorder:
+    """Collects per-interaction latencies from all session threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+        # interaction -> Counter of error messages
+        self.causes = defaultdict(Counter)
+
+    def record(self, interaction, seconds, ok=True):
+        with self._lock:
+            self.timings[interaction].append(seconds)
+            if not ok:
+                self.errors[interaction] += 1
+
+    def record_error(self, interaction, error):
+        """Count an error's cause; the first of each kind is logged in full"""
+        if isinstance(error, BaseException):
+            message = f"{type(error).__name__}: {error}"
+            details = "".join(traceback.format_exception(error))
+        else:
+            message = details = str(error)
+
+        with self._lock:
+            first = message not in self.causes[interaction]
+            self.causes[interaction][message] += 1
+        if first:
+            print(f"[{interaction}] {details}", file=sys.stderr)
+
+
+def isolate_app_tests():
+    """Let concurrent AppTests run in one process without sharing state
+
+    AppTest is built for one test at a time. Every run installs its mock
+    Runtime in a class-level singleton, patches streamlit's global
+    config.get_option for the duration of the run, and uses the same
+    session id. With several sessions running together, those overwrite
+    each other and runs fail in ways a real server never sees (e.g. a
+    KeyError for a widget's format_func once another run has unpatched
+    "global.appTest").
+
+    This gives each session thread its own mock runtime, resolved from the
+    script thread that runs on its behalf, and its own session id. It sets
+    the appTest config once for the whole process. Like a real server,
+    app.py is compiled once and shared.
+    """
+    from contextlib import nullcontext
+    from unittest.mock import MagicMock
+
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+    from streamlit.testing.v1.util import build_mock_config_get_option
+
+    runtimes = {}  # session thread id -> that session's mock runtime
+    owner = threading.local()  # script thread -> the session thread it serves
+
+    def session_thread():
+        return getattr(owner, "ident", threading.get_ident())
+
+    def make_runtime(*args, **kwargs):
+        # app_test only uses MagicMock for the runtime it installs
+        runtime = MagicMock(*args, **kwargs)
+        runtimes[threading.get_ident()] = runtime
+        return runtime
+
+    original_instance = Runtime.instance.__func__
+    original_exists = Runtime.exists.__func__
+
+    def instance(cls):
+        runtime = runtimes.get(session_thread())
+        return runtime if runtime is not None else original_instance(cls)
+
+    def exists(cls):
+        return session_thread() in runtimes or original_exists(cls)
+
+    app_test.MagicMock = make_runtime
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+
+    config.get_option = build_mock_config_get_option({"global.appTest": True})
+    app_test.patch_config_options = lambda overrides: nullcontext()
+
+    original_init = LocalScriptRunner.__init__
+    original_run_script_thread = LocalScriptRunner._run_script_thread
+
+    def init(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        self._session_thread = threading.get_ident()
+        self._session_id = f"load-test-{self._session_thread}"
+
+    def run_script_thread(self):
+        owner.ident = self._session_thread
+        original_run_script_thread(self)
+
+    LocalScriptRunner.__init__ = init
+    LocalScriptRunner._run_script_thread = run_script_thread
+
+    bytecode = {}
+    compile_lock = threading.Lock()
+    original_get_bytecode = ScriptCache.get_bytecode
+
+    def get_bytecode(self, script_path):
+        with compile_lock:
+            if script_path not in bytecode:
+                bytecode[script_path] = original_get_bytecode(self, script_path)
+            return bytecode[script_path]
+
+    ScriptCache.get_bytecode = get_bytecode
+
+
+def run_session(session_index, labels, iterations, recorder, timeout):
+    """One scripted user: upload, analyze, switch sections, change profile"""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(session_index)
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+    def step(interaction, action=None):
+        start = time.perf_counter()
+        ok = True
+        try:
+            if action is not None:
+                action()
+            at.run()
+            ok = not at.exception
+        except Exception as e:
+            ok = False
+            recorder.record_error(interaction, e)
+        else:
+            if not ok:
+                for exception in at.exception:
+                    recorder.record_error(interaction, exception.message)
+        recorder.record(interaction, time.perf_counter() - start, ok)
+
+    step("initial_load")
+
+    for _ in range(iterations):
+        label = labels[rng.randrange(len(labels))]
+        step("upload_and_analyze", lambda: at.file_uploader[0].set_value(label))
+
+        # Widgets are looked up by key on every step; element objects from an
+        # earlier run are stale after the next one
+        for key in [radio.key for radio in at.radio]:
+            for section in at.radio(key=key).options[1:]:
+                step(
+                    "switch_section",
+                    lambda k=key, s=section: at.radio(key=k).set_value(s),
+                )
+
+        profile = rng.choice(PROFILE_CHOICES)
+        step("change_profile", lambda: at.multiselect[0].set_value(profile))
+
+        for key in [selectbox.key for selectbox in at.selectbox]:
+            budget = rng.choice(at.selectbox(key=key).options)
+            step(
+                "change_budget",
+                lambda k=key, v=budget: at.selectbox(key=k).set_value(v),
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test app.py sessions")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent users")
+    parser.add_argument("--iterations", type=int, default=2, help="Labels per user")
+    parser.add_argument(
+        "--latency", type=float, default=0.5, help="Stub model latency (seconds)"
+    )
+    parser.add_argument("--labels", default=DATASET_DIR, help="Directory of labels")
+    parser.add_argument("--max-labels", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", action="store_true", help="Print a JSON report")
+    args = parser.parse_args()
+
+    # Keep per-run deprecation and context warnings out of the report
+    os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+    warnings.filterwarnings("ignore")
+
+    # Must be set before app.py imports ai_functions
+    os.environ["TRUTHINBITE_MODEL_BACKEND"] = "stub"
+    os.environ["TRUTHINBITE_STUB_LATENCY"] = str(args.latency)
+
+    labels = load_label_files(args.labels, args.max_labels)
+    if not labels:
+        parser.error(f"No label images found in {args.labels}")
+
+    isolate_app_tests()
+
+    # Warm-up session so imports and the first script compile are not timed
+    # against the concurrent users
+    run_session(-1, labels[:1], 0, LoadTestRecorder(), args.timeout)
+
+    recorder = LoadTestRecorder()
+    rss_before = current_rss_bytes()
+    cpu_before = time.process_time()
+    wall_start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        futures = [
+            pool.submit(
+                run_session, i, labels, args.iterations, recorder, args.timeout
+            )
+            for i in range(args.sessions)
+        ]
+        for future in futures:
+            future.result()
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_before
+    total = sum(len(t) for t in recorder.timings.values())
+
+    report = {
+        "sessions": args.sessions,
+        "iterations": args.iterations,
+        "stub_latency_s": args.latency,
+        "wall_s": round(wall, 3),
+        "interactions": total,
+        "throughput_per_s": round(total / wall, 2) if wall else 0.0,
+        "cpu_s": round(cpu, 3),
+        "cpu_utilisation": round(cpu / wall, 3) if wall else 0.0,
+        "rss_start_mb": round(rss_before / 1024 / 1024, 1),
+        "rss_end_mb": round(current_rss_bytes() / 1024 / 1024, 1),
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "interaction_ms": {
+            name: {
+                "count": len(times),
+                "errors": recorder.errors[name],
+                "p50": round(percentile(times, 50) * 1000, 1),
+                "p95": round(percentile(times, 95) * 1000, 1),
+                "p99": round(percentile(times, 99) * 1000, 1),
+            }
+            for name, times in sorted(recorder.timings.items())
+        },
+        "error_causes": {
+            name: dict(causes.most_common())
+            for name, causes in sorted(recorder.causes.items())
+        },
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(
+        f"{report['sessions']} sessions x {report['iterations']} labels, "
+        f"stub latency {args.latency}s"
+    )
+    print(
+        f"{total} interactions in {report['wall_s']}s "
+        f"({report['throughput_per_s']}/s), CPU {report['cpu_s']}s "
+        f"({report['cpu_utilisation']:.0%}), RSS {report['rss_start_mb']} -> "
+        f"{report['rss_end_mb']} MB (peak {report['peak_rss_mb']} MB)"
+    )
+    print(
+        f"{'interaction':<22}{'count':>7}{'errors':>8}"
+        f"{'p50':>10}{'p95':>10}{'p99':>10}"
+    )
+    for name, stats in report["interaction_ms"].items():
+        print(
+            f"{name:<22}{stats['count']:>7}{stats['errors']:>8}"
+            f"{stats['p50']:>8.1f}ms{stats['p95']:>8.1f}ms{stats['p99']:>8.1f}ms"
+        )
+
+    if report["error_causes"]:
+        print("\nError causes (full tracebacks on stderr):")
+        for name, causes in report["error_causes"].items():
+            for message, count in causes.items():
+                print(f"  {name}: {count} x {message.splitlines()[0][:120]}")
+
+
+if __name__ == "__main__":
+    main()
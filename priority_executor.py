@@ -0,0 +1,198 @@
+"""Shared executor that arbitrates model calls between workloads
+
+Interactive label scans and batch jobs share the same Gemini quota. Every
+model call goes through one PriorityExecutor:
+
+- interactive work is always dispatched before batch work
+- each class has its own concurrency cap, so batch jobs can never hold
+  more than TRUTHINBITE_BATCH_CONCURRENCY slots
+- inside a class, callers are served round-robin so one large submitter
+  cannot starve the others; the app uses one key per Streamlit session,
+  the API server one per client address, batch jobs their own name
+
+Callers choose their class with the workload() context manager:
+
+    with workload("batch", "nightly-dataset"):
+        get_structured_data_from_gemini(image, cache_key=key)
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# Highest priority first
+PRIORITY_CLASSES = [INTERACTIVE, BATCH]
+
+MODEL_CONCURRENCY = int(os.getenv("TRUTHINBITE_MODEL_CONCURRENCY", "8"))
+BATCH_CONCURRENCY = int(os.getenv("TRUTHINBITE_BATCH_CONCURRENCY", "2"))
+
+# Recent waits kept per class for the percentile metrics
+WAIT_SAMPLES = 1024
+
+_current_workload = contextvars.ContextVar(
+    "truthinbite_workload", default=(INTERACTIVE, None)
+)
+
+
+@contextmanager
+def workload(priority, key=None):
+    """Run the enclosed model calls in a priority class, fair-queued by key"""
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown priority class: {priority}")
+    token = _current_workload.set((priority, key))
+    try:
+        yield
+    finally:
+        _current_workload.reset(token)
+
+
+def current_workload():
+    """(priority, key) of the calling context"""
+    return _current_workload.get()
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class PriorityExecutor:
+    """Worker pool with strict class priority, per-class caps and fair queues"""
+
+    def __init__(self, max_workers=MODEL_CONCURRENCY, class_limits=None):
+        self.max_workers = max_workers
+        self.class_limits = {cls: max_workers for cls in PRIORITY_CLASSES}
+        self.class_limits[BATCH] = max(1, min(BATCH_CONCURRENCY, max_workers))
+        self.class_limits.update(class_limits or {})
+
+        self._cond = threading.Condition()
+        # class -> OrderedDict(fair key -> deque of tasks), rotated round-robin
+        self._queues = {cls: OrderedDict() for cls in PRIORITY_CLASSES}
+        self._queued = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._running = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._submitted = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._completed = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._waits = {cls: deque(maxlen=WAIT_SAMPLES) for cls in PRIORITY_CLASSES}
+
+        for i in range(max_workers):
+            threading.Thread(
+                target=self._worker_loop, name=f"model-worker-{i}", daemon=True
+            ).start()
+
+    def submit(self, fn, *args, priority=None, key=None, **kwargs):
+        """Queue fn(*args, **kwargs); defaults to the caller's workload()"""
+        if priority is None:
+            priority, context_key = current_workload()
+            key = key if key is not None else context_key
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        future = Future()
+        task = (future, fn, args, kwargs, time.perf_counter())
+        with self._cond:
+            self._queues[priority].setdefault(key, deque()).append(task)
+            self._queued[priority] += 1
+            self._submitted[priority] += 1
+            self._cond.notify()
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """Submit and wait for the result in the caller's workload class"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _next_task(self):
+        """Highest-priority task whose class is under its cap (lock held)"""
+        for priority in PRIORITY_CLASSES:
+            queues = self._queues[priority]
+            if not queues or self._running[priority] >= self.class_limits[priority]:
+                continue
+
+            key, tasks = next(iter(queues.items()))
+            task = tasks.popleft()
+            if tasks:
+                queues.move_to_end(key)
+            else:
+                del queues[key]
+            self._queued[priority] -= 1
+            self._running[priority] += 1
+            return priority, task
+        return None
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                picked = self._next_task()
+                while picked is None:
+                    self._cond.wait()
+                    picked = self._next_task()
+
+            priority, (future, fn, args, kwargs, queued_at) = picked
+            self._waits[priority].append(time.perf_counter() - queued_at)
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running[priority] -= 1
+                    self._completed[priority] += 1
+                    # A freed slot may unblock a capped class on another worker
+                    self._cond.notify_all()
+
+    def queue_depth(self):
+        with self._cond:
+            return sum(self._queued.values())
+
+    def stats(self):
+        """Queue depth, concurrency and wait-time percentiles per class"""
+        with self._cond:
+            snapshot = {
+                priority: (
+                    self._queued[priority],
+                    self._running[priority],
+                    self._submitted[priority],
+                    self._completed[priority],
+                    list(self._waits[priority]),
+                )
+                for priority in PRIORITY_CLASSES
+            }
+
+        return {
+            priority: {
+                "queued": queued,
+                "running": running,
+                "limit": self.class_limits[priority],
+                "submitted": submitted,
+                "completed": completed,
+                "wait_ms_p50": round(_percentile(waits, 50) * 1000, 1),
+                "wait_ms_p95": round(_percentile(waits, 95) * 1000, 1),
+                "wait_ms_max": round(max(waits, default=0.0) * 1000, 1),
+            }
+            for priority, (queued, running, submitted, completed, waits) in (
+                snapshot.items()
+            )
+        }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide executor shared by every model call"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = PriorityExecutor()
+        return _executor
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+# Combined byte ceiling for every ResultCache in the process
+MEMORY_LIMIT_BYTES = int(
+    float(os.getenv("TRUTHINBITE_MEMORY_LIMIT_MB", "512")) * 1024 * 1024
+)
+
+_caches = weakref.WeakSet()
+_budget_lock = threading.Lock()
+
+
+def content_key(*parts):
+    """Stable hash of JSON-serialisable values, used as a cache key"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def estimate_size(value, _seen=None):
+    """Approximate deep size in bytes of plain Python data"""
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(
+            estimate_size(k, _seen) + estimate_size(v, _seen)
+            for k, v in value.items()
+        )
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _seen) for item in value)
+    return size
+
+
+class ResultCache:
+    """Thread-safe LRU cache for model results shared across sessions
+
+    Entries are also counted against MEMORY_LIMIT_BYTES; when the process
+    total goes over the ceiling, least recently used entries are dropped
+    from the largest caches first.
+    """
+
+    def __init__(self, name, max_entries=512):
+        self.name = name
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _caches.add(self)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, size=None):
+        """Store a value; pass size when estimate_size would miss buffers"""
+        if size is None:
+            size = estimate_size(value)
+
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._sizes[key]
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self.bytes += size
+            while len(self._entries) > self.max_entries:
+                self._pop_oldest()
+
+        _enforce_memory_limit()
+
+    def _pop_oldest(self):
+        key, _ = self._entries.popitem(last=False)
+        self.bytes -= self._sizes.pop(key)
+        self.evictions += 1
+
+    def evict_oldest(self, keep=1):
+        """Drop the least recently used entry unless only `keep` remain"""
+        with self._lock:
+            if len(self._entries) <= keep:
+                return False
+            self._pop_oldest()
+            return True
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def items(self):
+        with self._lock:
+            return list(self._entries.items())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def total_cache_bytes():
+    return sum(cache.bytes for cache in list(_caches))
+
+
+def cache_stats():
+    return [cache.stats() for cache in list(_caches)]
+
+
+def _enforce_memory_limit():
+    """Evict LRU entries from the largest caches until under the ceiling"""
+    with _budget_lock:
+        while total_cache_bytes() > MEMORY_LIMIT_BYTES:
+            caches = sorted(list(_caches), key=lambda c: c.bytes, reverse=True)
+            if not any(cache.evict_oldest() for cache in caches):
+                break
@@ -0,0 +1,359 @@
+"""Persistent history of analyzed products with full-text ingredient search
+
+Every analyzed product is stored in SQLite: the raw product record, its AI
+summary and warnings, one row per nutrient (normalised to mg or kcal per
+100 g) and an FTS5 index over product name, ingredients and allergens.
+
+Enable it in the app by setting TRUTHINBITE_HISTORY_DB to a file path.
+Query from the command line:
+
+    python scan_history.py history.db --text "palm oil" --nutrient "sodium>500"
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from helper_functions import (
+    canonical_nutrient_name,
+    get_rule_pack,
+    parse_nutrient_amount,
+)
+
+HISTORY_DB_PATH = os.getenv("TRUTHINBITE_HISTORY_DB")
+
+# Comparison operators accepted in nutrient filters
+FILTER_OPERATORS = (">", ">=", "<", "<=", "=")
+
+# Nutrient filters matching fewer rows than this are resolved through the
+# (nutrient, amount) index; broader ones are checked per candidate row
+SELECTIVE_FILTER_ROWS = 5000
+
+# Bump when canonical_nutrient_name changes; older databases have their
+# scan_nutrients keys recomputed from the stored labels when opened
+NUTRIENT_KEYS_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT,
+    product_name TEXT,
+    net_weight REAL,
+    score INTEGER,
+    rules_version TEXT,
+    scanned_at REAL NOT NULL,
+    product_json TEXT NOT NULL,
+    summary_json TEXT,
+    warnings_json TEXT
+);
+CREATE INDEX IF NOT EXISTS scans_content_hash ON scans (content_hash);
+
+CREATE TABLE IF NOT EXISTS scan_nutrients (
+    scan_id INTEGER NOT NULL REFERENCES scans (id) ON DELETE CASCADE,
+    nutrient TEXT NOT NULL,
+    label TEXT,
+    amount REAL,
+    unit TEXT
+);
+CREATE INDEX IF NOT EXISTS scan_nutrients_by_scan
+    ON scan_nutrients (scan_id, nutrient, amount);
+CREATE INDEX IF NOT EXISTS scan_nutrients_by_value
+    ON scan_nutrients (nutrient, amount);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS scan_search USING fts5 (
+    product_name, ingredients, allergens,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def _fts_phrase(text):
+    """Quote user text as a single FTS5 phrase"""
+    return '"' + str(text).replace('"', '""') + '"'
+
+
+class ScanHistory:
+    """SQLite store of analyzed products, safe to share across sessions"""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+            self._rekey_nutrients()
+
+    def _rekey_nutrients(self):
+        """Recompute nutrient keys stored under an older NUTRIENT_KEYS_VERSION"""
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= NUTRIENT_KEYS_VERSION:
+            return
+        self._conn.create_function(
+            "canonical_nutrient", 1, canonical_nutrient_name, deterministic=True
+        )
+        with self._conn:
+            self._conn.execute(
+                "UPDATE scan_nutrients SET nutrient = canonical_nutrient(label)"
+                " WHERE label IS NOT NULL AND nutrient != canonical_nutrient(label)"
+            )
+            self._conn.execute(f"PRAGMA user_version = {NUTRIENT_KEYS_VERSION}")
+
+    def record_scan(self, product, summary=None, warnings=None, content_hash=None):
+        """Store one analyzed product and return its scan id"""
+        with self._lock, self._conn:
+            return self._insert(product, summary, warnings, content_hash)
+
+    def record_scans(self, records):
+        """Bulk insert (product, summary, warnings, content_hash) tuples"""
+        with self._lock, self._conn:
+            return [self._insert(*record) for record in records]
+
+    def _insert(self, product, summary, warnings, content_hash):
+        net_weight = product.get("net_weight")
+        score = (summary or {}).get("score")
+        cursor = self._conn.execute(
+            """
+            INSERT INTO scans (content_hash, product_name, net_weight, score,
+                               rules_version, scanned_at, product_json,
+                               summary_json, warnings_json)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                content_hash,
+                product.get("product_name"),
+                net_weight if isinstance(net_weight, (int, float)) else None,
+                score if isinstance(score, (int, float)) else None,
+                get_rule_pack().version,
+                time.time(),
+                json.dumps(product, ensure_ascii=False),
+                json.dumps(summary, ensure_ascii=False) if summary else None,
+                json.dumps(warnings or [], ensure_ascii=False),
+            ),
+        )
+        scan_id = cursor.lastrowid
+
+        nutrient_rows = []
+        for fact in product.get("nutrition_facts") or []:
+            if not isinstance(fact, dict):
+                continue
+            amount, unit = parse_nutrient_amount(fact.get("Value"))
+            nutrient_rows.append(
+                (
+                    scan_id,
+                    canonical_nutrient_name(fact.get("Nutrient")),
+                    fact.get("Nutrient"),
+                    amount,
+                    unit,
+                )
+            )
+        self._conn.executemany(
+            "INSERT INTO scan_nutrients (scan_id, nutrient, label, amount, unit)"
+            " VALUES (?, ?, ?, ?, ?)",
+            nutrient_rows,
+        )
+
+        ingredients = " | ".join(
+            str(ing.get("name", ""))
+            for ing in product.get("ingredients") or []
+            if isinstance(ing, dict)
+        )
+        allergens = " | ".join(str(a) for a in product.get("allergens") or [])
+        self._conn.execute(
+            "INSERT INTO scan_search (rowid, product_name, ingredients, allergens)"
+            " VALUES (?, ?, ?, ?)",
+            (scan_id, product.get("product_name") or "", ingredients, allergens),
+        )
+        return scan_id
+
+    def search(self, text=None, nutrients=None, limit=100):
+        """Find scans by ingredient text and nutrient thresholds, newest first
+
+        text: phrase matched against product name, ingredients and allergens
+        nutrients: list of (nutrient, operator, amount) with amounts per 100 g
+            in mg for mass nutrients and kcal for energy,
+            e.g. [("sodium", ">", 500)]
+        """
+        filters = []
+        for nutrient, operator, amount in nutrients or []:
+            if operator not in FILTER_OPERATORS:
+                raise ValueError(f"Unsupported operator: {operator}")
+            key = canonical_nutrient_name(nutrient)
+            matches = self._estimate_matches(key, operator, float(amount))
+            filters.append((matches, key, operator, float(amount)))
+        filters.sort()
+
+        # A selective nutrient filter drives the query through the
+        # (nutrient, amount) index and the phrase is checked per candidate;
+        # otherwise the FTS index drives and nutrients are checked per match
+        clauses = []
+        params = []
+        selective = bool(filters) and filters[0][0] < SELECTIVE_FILTER_ROWS
+        if text and not selective:
+            sql = "SELECT s.* FROM scan_search f JOIN scans s ON s.id = f.rowid"
+            clauses.append("scan_search MATCH ?")
+            params.append(_fts_phrase(text))
+            order = "f.rowid"
+        else:
+            sql = "SELECT s.* FROM scans s"
+            order = "s.id"
+
+        for matches, key, operator, amount in filters:
+            if matches < SELECTIVE_FILTER_ROWS:
+                clauses.append(
+                    "s.id IN (SELECT scan_id FROM scan_nutrients"
+                    f" WHERE nutrient = ? AND amount {operator} ?)"
+                )
+            else:
+                clauses.append(
+                    "EXISTS (SELECT 1 FROM scan_nutrients n WHERE n.scan_id = s.id"
+                    f" AND n.nutrient = ? AND n.amount {operator} ?)"
+                )
+            params.extend([key, amount])
+
+        if text and selective:
+            clauses.append(
+                "EXISTS (SELECT 1 FROM scan_search f"
+                " WHERE f.rowid = s.id AND scan_search MATCH ?)"
+            )
+            params.append(_fts_phrase(text))
+
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {order} DESC LIMIT ?"
+        params.append(int(limit))
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row_to_scan(row) for row in rows]
+
+    def _estimate_matches(self, nutrient, operator, amount):
+        """Count rows matching a nutrient filter, capped at SELECTIVE_FILTER_ROWS"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM (SELECT 1 FROM scan_nutrients"
+                f" WHERE nutrient = ? AND amount {operator} ? LIMIT ?)",
+                (nutrient, amount, SELECTIVE_FILTER_ROWS),
+            ).fetchone()[0]
+
+    def iter_scans(self, batch_size=1000):
+        """Yield every stored scan in insertion order, one batch at a time"""
+        for scans in self.iter_scan_batches(batch_size):
+            yield from scans
+
+    def iter_scan_batches(self, batch_size=1000, with_nutrients=False):
+        """Yield lists of up to batch_size scans in insertion order
+
+        with_nutrients adds "nutrients": {nutrient: amount per 100 g} from
+        the normalised scan_nutrients rows, fetched with one query per batch.
+        """
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT * FROM scans WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size),
+                ).fetchall()
+                nutrient_rows = []
+                if rows and with_nutrients:
+                    nutrient_rows = self._conn.execute(
+                        "SELECT scan_id, nutrient, amount FROM scan_nutrients"
+                        " WHERE scan_id BETWEEN ? AND ? AND amount IS NOT NULL"
+                        " ORDER BY rowid",
+                        (rows[0]["id"], rows[-1]["id"]),
+                    ).fetchall()
+            if not rows:
+                return
+
+            scans = [self._row_to_scan(row) for row in rows]
+            if with_nutrients:
+                by_id = {scan["id"]: scan for scan in scans}
+                for scan in scans:
+                    scan["nutrients"] = {}
+                for scan_id, nutrient, amount in nutrient_rows:
+                    by_id[scan_id]["nutrients"].setdefault(nutrient, amount)
+            yield scans
+            last_id = rows[-1]["id"]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM scans").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _row_to_scan(row):
+        return {
+            "id": row["id"],
+            "content_hash": row["content_hash"],
+            "product_name": row["product_name"],
+            "score": row["score"],
+            "rules_version": row["rules_version"],
+            "scanned_at": row["scanned_at"],
+            "product": json.loads(row["product_json"]),
+            "summary": json.loads(row["summary_json"]) if row["summary_json"] else None,
+            "warnings": json.loads(row["warnings_json"] or "[]"),
+        }
+
+
+_history = None
+_history_lock = threading.Lock()
+
+
+def get_scan_history():
+    """Shared history store, or None when TRUTHINBITE_HISTORY_DB is not set"""
+    global _history
+
+    if not HISTORY_DB_PATH:
+        return None
+
+    with _history_lock:
+        if _history is None:
+            _history = ScanHistory(HISTORY_DB_PATH)
+    return _history
+
+
+def _parse_nutrient_filter(expression):
+    """Parse 'sodium>500' into ('sodium', '>', 500.0)"""
+    for operator in (">=", "<=", ">", "<", "="):
+        if operator in expression:
+            nutrient, amount = expression.split(operator, 1)
+            return (nutrient.strip(), operator, float(amount))
+    raise argparse.ArgumentTypeError(f"Invalid nutrient filter: {expression}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the TruthInBite scan history")
+    parser.add_argument("db", help="Path to the history database")
+    parser.add_argument("--text", help="Ingredient, allergen or product phrase")
+    parser.add_argument(
+        "--nutrient",
+        action="append",
+        type=_parse_nutrient_filter,
+        default=[],
+        help="Filter per 100 g in mg (or kcal), e.g. 'sodium>500'; repeatable",
+    )
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    history = ScanHistory(args.db)
+    start = time.perf_counter()
+    scans = history.search(args.text, args.nutrient, args.limit)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    for scan in scans:
+        print(f"{scan['id']:>8}  {scan['score'] or '-':>3}  {scan['product_name']}")
+    print(f"{len(scans)} result(s) in {elapsed_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
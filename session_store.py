@@ -0,0 +1,77 @@
+"""Per-session memory accounting for the Streamlit app
+
+Sessions keep only small references (label content hashes) in
+st.session_state; the extracted products and decoded images live once per
+process in the shared ResultCaches. This module records how many bytes each
+session's state takes so containers can be sized.
+
+The registry is diagnostics only: pruning idle sessions from it frees no
+session state or cache entries. Streamlit releases a session's state when
+the browser disconnects, and the shared caches are bounded by
+TRUTHINBITE_MEMORY_LIMIT_MB.
+"""
+
+import os
+import threading
+import time
+
+from result_cache import MEMORY_LIMIT_BYTES, cache_stats, estimate_size
+
+# Sessions not seen for this long are pruned from the registry (and from
+# memory_report); their Streamlit state is unaffected
+SESSION_IDLE_SECONDS = float(os.getenv("TRUTHINBITE_SESSION_IDLE_SECONDS", "1800"))
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def session_state_bytes(state) -> int:
+    """Approximate size of a session's state (widget values included)"""
+    return sum(estimate_size(key) + estimate_size(state[key]) for key in state)
+
+
+def _prune_idle(now):
+    """Drop registry entries not seen for SESSION_IDLE_SECONDS (lock held)"""
+    idle = [
+        sid
+        for sid, info in _sessions.items()
+        if now - info["last_seen"] > SESSION_IDLE_SECONDS
+    ]
+    for sid in idle:
+        del _sessions[sid]
+
+
+def track_session(session_id, state):
+    """Record a session's current footprint and prune idle registry entries"""
+    now = time.time()
+    entry = {"last_seen": now, "bytes": session_state_bytes(state)}
+
+    with _sessions_lock:
+        _sessions[session_id] = entry
+        _prune_idle(now)
+
+    return entry
+
+
+def memory_report():
+    """Per-session bytes plus shared cache usage for the whole process"""
+    now = time.time()
+    with _sessions_lock:
+        _prune_idle(now)
+        sessions = [
+            {
+                "session": sid,
+                "bytes": info["bytes"],
+                "idle_seconds": round(now - info["last_seen"], 1),
+            }
+            for sid, info in _sessions.items()
+        ]
+
+    caches = cache_stats()
+    return {
+        "sessions": sorted(sessions, key=lambda s: s["bytes"], reverse=True),
+        "session_bytes": sum(s["bytes"] for s in sessions),
+        "caches": caches,
+        "cache_bytes": sum(c["bytes"] for c in caches),
+        "cache_limit_bytes": MEMORY_LIMIT_BYTES,
+    }
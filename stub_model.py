@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+import time
+
+# Simulated model latency in seconds (used for local runs and load tests)
+STUB_LATENCY = float(os.getenv("TRUTHINBITE_STUB_LATENCY", "0"))
+
+# Simulated one-off channel/TLS/auth setup paid by the first call on a model
+STUB_CONNECT_LATENCY = float(os.getenv("TRUTHINBITE_STUB_CONNECT_LATENCY", "0"))
+
+_STUB_PRODUCTS = [
+    {
+        "product_name": "Stub Masala Noodles",
+        "net_weight": 70.0,
+        "ingredients": [
+            {"name": "Refined Wheat Flour (Maida)", "details": "65%"},
+            {"name": "Palm Oil", "details": ""},
+            {"name": "Salt", "details": ""},
+            {"name": "Sugar", "details": ""},
+            {"name": "Monosodium Glutamate", "details": "INS 621"},
+        ],
+        "nutrition_facts": [
+            {"Nutrient": "Energy", "Value": "427 kcal"},
+            {"Nutrient": "Total Fat", "Value": "15.7g"},
+            {"Nutrient": "Saturated Fat", "Value": "7.2g"},
+            {"Nutrient": "Trans Fat", "Value": "0.1g"},
+            {"Nutrient": "Sodium", "Value": "1180mg"},
+            {"Nutrient": "Total Carbohydrates", "Value": "63g"},
+            {"Nutrient": "Total Sugars", "Value": "2.1g"},
+            {"Nutrient": "Protein", "Value": "8.6g"},
+        ],
+        "allergens": ["Contains wheat", "May contain milk, soy and nuts"],
+    }
+]
+
+_STUB_SUMMARY = {
+    "score": 42,
+    "verdict": "Highly processed with refined flour and flavour enhancers",
+    "reasons": [
+        "Refined wheat flour as main ingredient - reduces score by 15 points",
+        "Contains MSG (INS 621) - reduces score by 10 points",
+        "Palm oil - reduces score by 10 points",
+    ],
+    "who_compliance": [
+        "Sodium level exceeds WHO guidelines",
+        "Trans fat is within WHO guidelines",
+    ],
+    "ingredient_quality": [
+        "Highly processed ingredients detected",
+        "Contains 1 flavour enhancer",
+    ],
+}
+
+_STUB_ALTERNATIVES = [
+    {
+        "name": "Homemade Vegetable Poha",
+        "why_better": "Flattened rice with vegetables, no flavour enhancers",
+        "price_range": "₹20-30",
+        "availability": "Any kirana store",
+        "preparation_tip": "Rinse poha, temper with mustard seeds and curry leaves",
+    },
+    {
+        "name": "Millet Noodles",
+        "why_better": "Whole millet flour instead of maida",
+        "price_range": "₹40-60",
+        "availability": "Supermarkets and online",
+        "preparation_tip": "Cook with fresh vegetables instead of the tastemaker",
+    },
+]
+
+
+class StubResponse:
+    """Minimal stand-in for a Gemini response object"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Offline stand-in for genai.GenerativeModel returning canned JSON"""
+
+    def __init__(self, model_name, latency=None, connect_latency=None):
+        self.model_name = model_name
+        self.latency = STUB_LATENCY if latency is None else latency
+        self.connect_latency = (
+            STUB_CONNECT_LATENCY if connect_latency is None else connect_latency
+        )
+        self._connected = threading.Event()
+        self._connect_lock = threading.Lock()
+
+    def _connect(self):
+        if self._connected.is_set():
+            return
+        with self._connect_lock:
+            if not self._connected.is_set():
+                if self.connect_latency > 0:
+                    time.sleep(self.connect_latency)
+                self._connected.set()
+
+    def count_tokens(self, contents):
+        self._connect()
+        return {"total_tokens": len(str(contents).split())}
+
+    def generate_content(self, contents):
+        self._connect()
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        # Image requests are extractions; text prompts are summaries or alternatives
+        if isinstance(contents, list) and any(
+            not isinstance(part, str) for part in contents
+        ):
+            payload = _STUB_PRODUCTS
+        elif "alternatives" in str(contents).lower():
+            payload = _STUB_ALTERNATIVES
+        else:
+            payload = _STUB_SUMMARY
+
+        return StubResponse(f"```json\n{json.dumps(payload)}\n```")
@@ -0,0 +1,53 @@
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from export_scans import export_scans, scan_to_row
+from scan_history import ScanHistory
+from test_scan_history import MUFA_PRODUCT
+
+
+def test_unsaturated_fat_does_not_fill_saturated_columns(tmp_path):
+    history = ScanHistory(str(tmp_path / "history.db"))
+    try:
+        history.record_scan(MUFA_PRODUCT)
+        [scans] = history.iter_scan_batches(with_nutrients=True)
+        row = scan_to_row(scans[0])
+    finally:
+        history.close()
+
+    assert row["saturated_fat_mg_per_100g"] == 2000
+    assert row["monounsaturated_fat_mg_per_100g"] == 25000
+    assert row["polyunsaturated_fat_mg_per_100g"] == 30000
+    assert row["who_saturated_fat_exceeded"] is False
+
+
+def test_stored_and_parsed_nutrients_agree(tmp_path):
+    history = ScanHistory(str(tmp_path / "history.db"))
+    try:
+        history.record_scan(MUFA_PRODUCT)
+        [scans] = history.iter_scan_batches(with_nutrients=True)
+    finally:
+        history.close()
+
+    scan = scans[0]
+    parsed = dict(scan)
+    del parsed["nutrients"]
+    assert scan_to_row(scan) == scan_to_row(parsed)
+
+
+def test_export_round_trip(tmp_path):
+    history = ScanHistory(str(tmp_path / "history.db"))
+    try:
+        for _ in range(3):
+            history.record_scan(MUFA_PRODUCT)
+        report = export_scans(history, str(tmp_path / "out"), rows_per_file=2)
+    finally:
+        history.close()
+
+    assert report["rows"] == 3
+    assert len(report["files"]) == 2
+    table = pq.read_table(str(tmp_path / "out"))
+    assert table.num_rows == 3
+    assert table.column("who_saturated_fat_exceeded").to_pylist() == [False] * 3
+    assert table.schema.metadata[b"truthinbite_schema_version"] == b"2"
@@ -0,0 +1,115 @@
+import json
+
+import pytest
+
+from helper_functions import (
+    RULES_PATH,
+    canonical_nutrient_name,
+    get_condition_hits,
+    get_rule_pack,
+    merge_partial_products,
+    reload_rule_pack,
+    run_health_analysis,
+)
+
+
+@pytest.mark.parametrize(
+    "label, key",
+    [
+        ("Saturated Fat", "saturated_fat"),
+        ("of which saturates", "saturated_fat"),
+        ("Monounsaturated Fat", "monounsaturated_fat"),
+        ("Mono-unsaturated Fatty Acids", "monounsaturated_fat"),
+        ("Polyunsaturated Fat", "polyunsaturated_fat"),
+        ("PUFA", "polyunsaturated_fat"),
+        ("Unsaturated Fat", "unsaturated_fat"),
+        ("Trans Fat", "trans_fat"),
+        ("Total Fat", "total_fat"),
+        ("Energy from Fat", "energy_from_fat"),
+        ("Calories from Fat", "energy_from_fat"),
+        ("Energy", "energy"),
+        ("Calories", "energy"),
+        ("Sugar Alcohols", "sugar_alcohols"),
+        ("Polyols", "sugar_alcohols"),
+        ("Added Sugars", "added_sugars"),
+        ("Total Sugars", "total_sugars"),
+        ("Soluble Fibre", "soluble_fiber"),
+        ("Insoluble Fiber", "insoluble_fiber"),
+        ("Dietary Fiber", "dietary_fiber"),
+        ("Total Carbohydrate", "carbohydrates"),
+        ("Sodium", "sodium"),
+        ("Protein", "protein"),
+        ("Vitamin C", "vitamin_c"),
+    ],
+)
+def test_canonical_nutrient_name(label, key):
+    assert canonical_nutrient_name(label) == key
+
+
+def test_merge_keeps_distinct_nutrient_rows():
+    front = [{"product_name": "Groundnut Oil", "net_weight": 500, "ingredients": []}]
+    back = [
+        {
+            "product_name": None,
+            "ingredients": [{"name": None}, {"name": "Groundnut Oil"}],
+            "nutrition_facts": [
+                {"Nutrient": "Total Fat", "Value": "100g"},
+                {"Nutrient": "Saturated Fat", "Value": "18g"},
+                {"Nutrient": "Monounsaturated Fat", "Value": "49g"},
+                {"Nutrient": "Polyunsaturated Fat", "Value": "33g"},
+            ],
+        }
+    ]
+    side = [
+        {
+            "product_name": "groundnut oil",
+            "nutrition_facts": [
+                {"Nutrient": "Total fat", "Value": "100 g"},
+                {"Nutrient": "Soluble Fibre", "Value": "0g"},
+                {"Nutrient": "Dietary Fibre", "Value": "0g"},
+            ],
+        }
+    ]
+
+    [product] = merge_partial_products([front, back, side])
+    assert [fact["Nutrient"] for fact in product["nutrition_facts"]] == [
+        "Total Fat",
+        "Saturated Fat",
+        "Monounsaturated Fat",
+        "Polyunsaturated Fat",
+        "Soluble Fibre",
+        "Dietary Fibre",
+    ]
+    assert [ing["name"] for ing in product["ingredients"]] == ["Groundnut Oil"]
+
+
+def test_hits_from_an_older_rule_version_are_recomputed(tmp_path):
+    product = {"ingredients": [{"name": "Sugar"}], "allergens": []}
+    [hits] = get_condition_hits([product])
+    before = run_health_analysis(product, ["Diabetes Type 2"], hits)
+    assert before
+
+    with open(RULES_PATH, encoding="utf-8") as f:
+        rules = json.load(f)
+    rules["conditions"].reverse()
+    reordered = tmp_path / "rules.json"
+    reordered.write_text(json.dumps(rules), encoding="utf-8")
+
+    original = get_rule_pack().source
+    try:
+        reload_rule_pack(str(reordered))
+        assert hits.rules_version != get_rule_pack().version
+        assert run_health_analysis(product, ["Diabetes Type 2"], hits) == before
+    finally:
+        reload_rule_pack(original)
+
+
+def test_hits_follow_the_product_list_not_the_label():
+    plain = {"ingredients": [{"name": "Rice"}], "allergens": []}
+    with_nuts = {"ingredients": [{"name": "Rice"}], "allergens": ["Contains cashew"]}
+
+    assert len(get_condition_hits([plain])) == 1
+    # A retry of the same label returns more products, or a fuller record
+    assert len(get_condition_hits([plain, with_nuts])) == 2
+    [hits] = get_condition_hits([with_nuts])
+    assert run_health_analysis(with_nuts, ["Nut Allergy"], hits)
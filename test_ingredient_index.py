@@ -0,0 +1,14 @@
+from helper_functions import get_rule_pack
+from ingredient_index import IngredientIndex
+
+
+def test_names_beyond_the_limit_get_no_id():
+    pack = get_rule_pack()
+    index = IngredientIndex(max_entries=2)
+    sugar, salt = index.classify("Sugar", pack), index.classify("Salt", pack)
+    assert (sugar.id, salt.id) == (0, 1)
+    assert index.classify("  SUGAR ", pack) is sugar
+
+    palm_oil, cocoa = index.classify("Palm Oil", pack), index.classify("Cocoa", pack)
+    assert palm_oil.id is None and cocoa.id is None
+    assert palm_oil.name == "palm oil" and len(index) == 2
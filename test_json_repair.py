@@ -0,0 +1,82 @@
+from json_repair import CLEAN, FAILED, PARTIAL, REPAIRED, parse_model_json
+
+
+def is_product_list(value):
+    return all(isinstance(item, dict) and "product_name" in item for item in value)
+
+
+def test_clean_array():
+    assert parse_model_json('[{"product_name": "X"}]') == ([{"product_name": "X"}], CLEAN)
+
+
+def test_code_fence_and_prose():
+    text = 'Here you go:\n```json\n[{"product_name": "X"}]\n```\nHope this helps'
+    assert parse_model_json(text) == ([{"product_name": "X"}], CLEAN)
+
+
+def test_trailing_comma():
+    value, status = parse_model_json('[{"a": 1, "b": [1, 2,],}, {"c": 3},]')
+    assert value == [{"a": 1, "b": [1, 2]}, {"c": 3}]
+    assert status == REPAIRED
+
+
+def test_missing_comma():
+    value, status = parse_model_json('[{"a": 1 "b": 2} {"c": 3}]')
+    assert value == [{"a": 1, "b": 2}, {"c": 3}]
+    assert status == REPAIRED
+
+
+def test_python_literals_and_raw_newline():
+    value, status = parse_model_json('{"score": 5, "ok": True, "note": "a\nb"}', dict)
+    assert value == {"score": 5, "ok": True, "note": "a\nb"}
+    assert status == REPAIRED
+
+
+def test_truncated_array_keeps_whole_elements():
+    text = '[{"product_name": "A", "ingredients": ["x"]}, {"product_name": "B", "ingr'
+    value, status = parse_model_json(text)
+    assert value == [{"product_name": "A", "ingredients": ["x"]}]
+    assert status == PARTIAL
+
+
+def test_truncated_object_keeps_balanced_prefix():
+    value, status = parse_model_json('{"score": 40, "reasons": ["one", "tw', dict)
+    assert value == {"score": 40, "reasons": ["one"]}
+    assert status == PARTIAL
+
+
+def test_bracket_in_prose_before_json():
+    text = 'Based on the label [front side], here is the JSON: [{"product_name": "X"}]'
+    assert parse_model_json(text) == ([{"product_name": "X"}], CLEAN)
+    assert parse_model_json(text, accept=is_product_list) == (
+        [{"product_name": "X"}],
+        CLEAN,
+    )
+
+
+def test_bracket_in_prose_before_truncated_json():
+    text = 'Label [back]: [{"product_name": "X"}, {"product_name": "Y", "net'
+    value, status = parse_model_json(text, accept=is_product_list)
+    assert value == [{"product_name": "X"}]
+    assert status == PARTIAL
+
+
+def test_wrong_shape_fails():
+    assert parse_model_json('junk {"a": 1}', accept=is_product_list) == (None, FAILED)
+    assert parse_model_json('{"verdict": "ok"}', dict, lambda v: "score" in v) == (
+        None,
+        FAILED,
+    )
+
+
+def test_empty_or_missing_json_fails():
+    assert parse_model_json("[]") == (None, FAILED)
+    assert parse_model_json("Sorry, I cannot read this label [blurry].") == (
+        None,
+        FAILED,
+    )
+    assert parse_model_json("") == (None, FAILED)
+
+
+def test_lone_object_coerced_to_list():
+    assert parse_model_json('{"product_name": "X"}') == ([{"product_name": "X"}], CLEAN)
@@ -0,0 +1,84 @@
+import sqlite3
+
+import pytest
+
+import scan_history
+from scan_history import ScanHistory
+
+
+MUFA_PRODUCT = {
+    "product_name": "Cold Pressed Groundnut Oil",
+    "net_weight": 100,
+    "nutrition_facts": [
+        {"Nutrient": "Total Fat", "Value": "100g"},
+        {"Nutrient": "Monounsaturated Fat", "Value": "25g"},
+        {"Nutrient": "Polyunsaturated Fat", "Value": "30g"},
+        {"Nutrient": "Saturated Fat", "Value": "2g"},
+    ],
+}
+
+
+def test_search_does_not_count_unsaturated_fat_as_saturated(tmp_path):
+    history = ScanHistory(str(tmp_path / "history.db"))
+    try:
+        scan_id = history.record_scan(MUFA_PRODUCT)
+        assert history.search(nutrients=[("saturated fat", ">", 20000)]) == []
+        found = history.search(nutrients=[("monounsaturated fat", ">", 20000)])
+        assert [scan["id"] for scan in found] == [scan_id]
+    finally:
+        history.close()
+
+
+def test_old_nutrient_keys_are_recomputed(tmp_path):
+    path = str(tmp_path / "history.db")
+    history = ScanHistory(path)
+    scan_id = history.record_scan(MUFA_PRODUCT)
+    history.close()
+
+    # Simulate a database written with the old substring matching
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute(
+            "UPDATE scan_nutrients SET nutrient = 'saturated_fat'"
+            " WHERE label LIKE '%saturated%'"
+        )
+        conn.execute("PRAGMA user_version = 0")
+    conn.close()
+
+    history = ScanHistory(path)
+    try:
+        assert history.search(nutrients=[("saturated fat", ">", 20000)]) == []
+        found = history.search(nutrients=[("polyunsaturated fat", ">", 20000)])
+        assert [scan["id"] for scan in found] == [scan_id]
+    finally:
+        history.close()
+
+
+def _product(name, ingredients, sodium):
+    return {
+        "product_name": name,
+        "ingredients": [{"name": ingredient} for ingredient in ingredients],
+        "nutrition_facts": [{"Nutrient": "Sodium", "Value": sodium}],
+    }
+
+
+@pytest.mark.parametrize("selective_rows", [scan_history.SELECTIVE_FILTER_ROWS, 0])
+def test_phrase_search_with_nutrient_filter(tmp_path, monkeypatch, selective_rows):
+    # 0 makes every nutrient filter non-selective, so the FTS index drives
+    monkeypatch.setattr(scan_history, "SELECTIVE_FILTER_ROWS", selective_rows)
+    history = ScanHistory(str(tmp_path / "history.db"))
+    try:
+        salty = history.record_scan(
+            _product("Cream Crackers", ["Wheat Flour", "Palm Oil"], "700mg")
+        )
+        history.record_scan(_product("Digestives", ["Palm Oil", "Sugar"], "300mg"))
+        # Same words, not the phrase
+        history.record_scan(
+            _product("Trail Mix", ["Oil Roasted Peanuts", "Palm Sugar"], "800mg")
+        )
+
+        found = history.search("palm oil", nutrients=[("sodium", ">", 500)])
+        assert [scan["id"] for scan in found] == [salty]
+        assert history.search("oil palm", nutrients=[("sodium", ">", 500)]) == []
+    finally:
+        history.close()
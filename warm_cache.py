@@ -0,0 +1,255 @@
+"""Pre-populate the model-result caches so a new deployment starts warm
+
+Sources can be a directory of reference label images (each is extracted,
+summarised and given default alternatives through the model, as batch
+work) or a snapshot file exported earlier:
+
+    python warm_cache.py DataSet/ --output snapshot.json.gz
+    python warm_cache.py snapshot.json.gz
+    python warm_cache.py --from-url http://127.0.0.1:8080 --output snapshot.json.gz
+
+At startup, set TRUTHINBITE_CACHE_WARM_PATH to a directory or snapshot
+(or pass --warm-cache to api_server.py). Snapshots load before the first
+request; directories are warmed in the background.
+
+To save snapshots from a running process (the Streamlit app included),
+set TRUTHINBITE_CACHE_SNAPSHOT_PATH; the caches are written there every
+TRUTHINBITE_CACHE_SNAPSHOT_INTERVAL seconds (default 600) and at exit.
+Snapshots hold every user's extracted label data, so keep them private.
+"""
+
+import argparse
+import atexit
+import gzip
+import json
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from ai_functions import (
+    export_cache_snapshot,
+    get_ai_product_summary,
+    get_healthy_alternatives,
+    get_structured_data_from_gemini,
+    load_cache_snapshot,
+)
+from image_cache import load_label_image
+from priority_executor import BATCH, workload
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+WARM_PATH = os.getenv("TRUTHINBITE_CACHE_WARM_PATH")
+SNAPSHOT_PATH = os.getenv("TRUTHINBITE_CACHE_SNAPSHOT_PATH")
+SNAPSHOT_INTERVAL_SECONDS = float(
+    os.getenv("TRUTHINBITE_CACHE_SNAPSHOT_INTERVAL", "600")
+)
+
+# Bearer token api_server requires for GET /cache/snapshot; the endpoint is
+# disabled when unset
+SNAPSHOT_TOKEN = os.getenv("TRUTHINBITE_SNAPSHOT_TOKEN")
+
+_startup_lock = threading.Lock()
+_startup_report = None
+_export_lock = threading.Lock()
+_export_status = None
+
+
+def read_snapshot(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_snapshot(path, snapshot):
+    # Written next to the target and renamed, so readers never see half a file
+    opener = gzip.open if path.endswith(".gz") else open
+    tmp_path = f"{path}.tmp"
+    with opener(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def fetch_snapshot(base_url, token=SNAPSHOT_TOKEN, timeout=60):
+    """Snapshot exported by a running api_server (GET /cache/snapshot)"""
+    url = base_url.rstrip("/") + "/cache/snapshot"
+    request = urllib.request.Request(url)
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.load(response)
+
+
+def _warm_label(path, alternatives):
+    """Extract one label and warm its summary (and alternatives); returns status"""
+    with open(path, "rb") as f:
+        label = load_label_image(f.read())
+
+    product_list = get_structured_data_from_gemini(label.upload, cache_key=label.key)
+    if not isinstance(product_list, list):
+        return "failed"
+
+    for product in product_list:
+        get_ai_product_summary(product)
+        if alternatives:
+            get_healthy_alternatives(product)
+    return "ok"
+
+
+def warm_from_directory(directory, alternatives=True, workers=4):
+    """Run every label image in a directory through the model as batch work"""
+    paths = sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+    def warm(path):
+        # Queued behind interactive scans by the shared priority executor
+        with workload(BATCH, "cache-warmup"):
+            try:
+                return _warm_label(path, alternatives)
+            except Exception as e:
+                print(f"Could not warm {path}: {e}")
+                return "failed"
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        statuses = list(pool.map(warm, paths))
+
+    return {"labels": len(paths), "failed": statuses.count("failed")}
+
+
+def warm_cache(path, alternatives=True, workers=4):
+    """Warm from a directory or snapshot file; returns a report with timings"""
+    start = time.perf_counter()
+    if os.path.isdir(path):
+        report = warm_from_directory(path, alternatives, workers)
+        report["source"] = "directory"
+    else:
+        report = {"loaded": load_cache_snapshot(read_snapshot(path))}
+        report["source"] = "snapshot"
+
+    caches = export_cache_snapshot()["caches"]
+    report["path"] = path
+    report["entries"] = {name: len(entries) for name, entries in caches.items()}
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    return report
+
+
+def start_cache_warmup(path=WARM_PATH):
+    """Warm the caches once per process at startup
+
+    A snapshot is loaded before returning; a directory is warmed in a
+    background thread so the process can serve traffic meanwhile.
+    """
+    global _startup_report
+    with _startup_lock:
+        if not path or _startup_report is not None:
+            return _startup_report
+        _startup_report = {"path": path, "done": False}
+
+    def run():
+        global _startup_report
+        try:
+            report = warm_cache(path)
+        except Exception as e:
+            report = {"path": path, "error": str(e)}
+        _startup_report = {**report, "done": True}
+        print(f"Cache warm-up: {json.dumps(_startup_report)}")
+
+    if os.path.isdir(path):
+        threading.Thread(target=run, name="cache-warmup", daemon=True).start()
+    else:
+        run()
+    return _startup_report
+
+
+def cache_warmup_status():
+    return _startup_report
+
+
+def export_snapshot(path=SNAPSHOT_PATH):
+    """Write the current caches to path; returns a report with timings"""
+    global _export_status
+    start = time.perf_counter()
+    with _export_lock:
+        snapshot = export_cache_snapshot()
+        write_snapshot(path, snapshot)
+    _export_status = {
+        "path": path,
+        "written": snapshot["created"],
+        "entries": {name: len(entries) for name, entries in snapshot["caches"].items()},
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    return _export_status
+
+
+def start_snapshot_export(path=SNAPSHOT_PATH, interval=SNAPSHOT_INTERVAL_SECONDS):
+    """Save the caches to path periodically and at exit, once per process"""
+    global _export_status
+    with _startup_lock:
+        if not path or _export_status is not None:
+            return _export_status
+        _export_status = {"path": path, "written": None}
+
+    def save():
+        try:
+            export_snapshot(path)
+        except Exception as e:
+            print(f"Could not write cache snapshot {path}: {e}")
+
+    def run():
+        while True:
+            time.sleep(interval)
+            save()
+
+    threading.Thread(target=run, name="cache-snapshot", daemon=True).start()
+    atexit.register(save)
+    return _export_status
+
+
+def snapshot_export_status():
+    return _export_status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm or export TruthInBite caches")
+    parser.add_argument(
+        "source", nargs="?", help="Directory of label images or a snapshot file"
+    )
+    parser.add_argument("--from-url", help="Export from a running api_server instead")
+    parser.add_argument("--output", help="Write the resulting caches as a snapshot")
+    parser.add_argument(
+        "--no-alternatives",
+        action="store_true",
+        help="Only warm extractions and summaries",
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--token",
+        default=SNAPSHOT_TOKEN,
+        help="Snapshot token for --from-url (default: TRUTHINBITE_SNAPSHOT_TOKEN)",
+    )
+    args = parser.parse_args()
+
+    if bool(args.source) == bool(args.from_url):
+        parser.error("Give either a source path or --from-url")
+
+    if args.from_url:
+        start = time.perf_counter()
+        snapshot = fetch_snapshot(args.from_url, args.token)
+        counts = {name: len(entries) for name, entries in snapshot["caches"].items()}
+        print(f"Fetched {counts} in {time.perf_counter() - start:.2f}s")
+    else:
+        report = warm_cache(args.source, not args.no_alternatives, args.workers)
+        print(json.dumps(report, indent=2))
+        snapshot = export_cache_snapshot()
+
+    if args.output:
+        write_snapshot(args.output, snapshot)
+        print(f"Snapshot written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()